@@ -0,0 +1,225 @@
+import collections
+import threading
+import time
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from ava_mosaic_ai.utils.json_codec import default_codec
+
+# internal headers set by create_completion, consumed by CustomHTTPXClient
+MODEL_HEADER = "x-mosaic-model"
+RESPONSE_MODEL_HEADER = "x-mosaic-response-model"
+
+
+class ModelPrice(BaseModel):
+    # USD per million tokens
+    input: float = 0.0
+    output: float = 0.0
+    # prompt tokens served from the provider's prompt cache, defaults to `input`
+    cached_input: Optional[float] = None
+
+
+class Budget(BaseModel):
+    # limits since the accountant was created or last reset, None for no limit
+    max_tokens: Optional[int] = Field(default=None, ge=0)
+    max_cost: Optional[float] = Field(default=None, ge=0)
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised by create_completion when a budget of one of its labels is spent."""
+
+
+class Usage(NamedTuple):
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    model: Optional[str]
+
+
+def extract_usage(body: Any) -> Optional[Usage]:
+    """Read the usage block of an OpenAI or Anthropic response body."""
+    if not isinstance(body, dict):
+        return None
+    usage = body.get("usage")
+    if not isinstance(usage, dict):
+        return None
+    if "input_tokens" in usage:
+        # Anthropic counts cache reads apart from input_tokens
+        cached = usage.get("cache_read_input_tokens") or 0
+        prompt = (usage.get("input_tokens") or 0) + cached
+        prompt += usage.get("cache_creation_input_tokens") or 0
+        completion = usage.get("output_tokens") or 0
+    else:
+        details = usage.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") or 0
+        prompt = usage.get("prompt_tokens") or 0
+        completion = usage.get("completion_tokens") or 0
+    return Usage(prompt, completion, cached, body.get("model"))
+
+
+class _Counter:
+    __slots__ = ("requests", "prompt_tokens", "completion_tokens", "cached_tokens", "cost", "buckets")
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost = 0.0
+        # one [second, requests, tokens, cost] entry per second with traffic
+        self.buckets: Deque[List[float]] = collections.deque()
+
+    def add(self, usage: Usage, cost: float, now: float, window: float) -> None:
+        self.requests += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.cached_tokens += usage.cached_tokens
+        self.cost += cost
+        second = int(now)
+        tokens = usage.prompt_tokens + usage.completion_tokens
+        if self.buckets and self.buckets[-1][0] == second:
+            bucket = self.buckets[-1]
+            bucket[1] += 1
+            bucket[2] += tokens
+            bucket[3] += cost
+        else:
+            self.buckets.append([second, 1, tokens, cost])
+        self._expire(now, window)
+
+    def _expire(self, now: float, window: float) -> None:
+        while self.buckets and self.buckets[0][0] <= now - window:
+            self.buckets.popleft()
+
+    def snapshot(self, now: float, window: float) -> Dict[str, float]:
+        self._expire(now, window)
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cost": self.cost,
+            "requests_per_second": sum(b[1] for b in self.buckets) / window,
+            "tokens_per_second": sum(b[2] for b in self.buckets) / window,
+            "cost_per_second": sum(b[3] for b in self.buckets) / window,
+        }
+
+
+class UsageAccountant:
+    """
+    Thread-safe usage and cost counters, fed once per HTTP response by
+    CustomHTTPXClient.
+
+    Every response is counted under each of its labels: provider, model,
+    response_model and the `metadata` keys of the LLMFactory that sent it
+    (restricted to `metadata_keys` when given). Counters are cumulative, rates
+    cover the last `window` seconds. `prices` maps model names, or model name
+    prefixes such as "gpt-4o", to a ModelPrice. `budgets` maps `(label, value)`
+    pairs, e.g. `("tenant", "acme")`, to a Budget checked before each call.
+    """
+
+    def __init__(
+        self,
+        prices: Optional[Dict[str, ModelPrice]] = None,
+        budgets: Optional[Dict[Tuple[str, str], Budget]] = None,
+        metadata_keys: Optional[List[str]] = None,
+        window: float = 60.0,
+    ):
+        self.prices = dict(prices or {})
+        self.budgets = dict(budgets or {})
+        self.metadata_keys = metadata_keys
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, str], _Counter] = {}
+        self._total = _Counter()
+        # longest prefix first, so "gpt-4o-mini" wins over "gpt-4o"
+        self._price_prefixes = sorted(self.prices, key=len, reverse=True)
+
+    def labels(self, provider: str, metadata: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Static labels of a factory: its provider and the selected metadata keys."""
+        labels = {"provider": provider}
+        for key, value in (metadata or {}).items():
+            if self.metadata_keys is not None and key not in self.metadata_keys:
+                continue
+            if isinstance(value, (str, int, float, bool)):
+                labels[key] = str(value)
+        return labels
+
+    def price(self, model: Optional[str]) -> Optional[ModelPrice]:
+        if model is None:
+            return None
+        if model in self.prices:
+            return self.prices[model]
+        for prefix in self._price_prefixes:
+            if model.startswith(prefix):
+                return self.prices[prefix]
+        return None
+
+    def cost(self, usage: Usage, model: Optional[str] = None) -> float:
+        price = self.price(model or usage.model)
+        if price is None:
+            return 0.0
+        cached_price = price.input if price.cached_input is None else price.cached_input
+        uncached = usage.prompt_tokens - usage.cached_tokens
+        return (
+            uncached * price.input
+            + usage.cached_tokens * cached_price
+            + usage.completion_tokens * price.output
+        ) / 1_000_000
+
+    def record(self, labels: Dict[str, str], usage: Usage) -> float:
+        """Count `usage` under every label, returns its cost."""
+        if "model" not in labels and usage.model:
+            labels = {**labels, "model": usage.model}
+        cost = self.cost(usage, labels.get("model"))
+        now = time.time()
+        with self._lock:
+            self._total.add(usage, cost, now, self.window)
+            for item in labels.items():
+                counter = self._counters.get(item)
+                if counter is None:
+                    counter = self._counters[item] = _Counter()
+                counter.add(usage, cost, now, self.window)
+        return cost
+
+    def check(self, labels: Dict[str, str]) -> None:
+        """Raise BudgetExceededError when a budget of one of `labels` is spent."""
+        if not self.budgets:
+            return
+        with self._lock:
+            for item in labels.items():
+                budget = self.budgets.get(item)
+                counter = self._counters.get(item)
+                if budget is None or counter is None:
+                    continue
+                tokens = counter.prompt_tokens + counter.completion_tokens
+                if budget.max_tokens is not None and tokens >= budget.max_tokens:
+                    raise BudgetExceededError(
+                        f"Token budget of {item[0]}={item[1]} exceeded: {tokens} >= {budget.max_tokens}"
+                    )
+                if budget.max_cost is not None and counter.cost >= budget.max_cost:
+                    raise BudgetExceededError(
+                        f"Cost budget of {item[0]}={item[1]} exceeded: "
+                        f"{counter.cost:.4f} >= {budget.max_cost}"
+                    )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and rates, overall under "total" and per label under "by_<label>"."""
+        now = time.time()
+        with self._lock:
+            snapshot: Dict[str, Any] = {"total": self._total.snapshot(now, self.window)}
+            for (label, value), counter in self._counters.items():
+                snapshot.setdefault(f"by_{label}", {})[value] = counter.snapshot(
+                    now, self.window
+                )
+        return snapshot
+
+    def export(self) -> str:
+        """Snapshot as a JSON string, e.g. for a metrics endpoint or a periodic log line."""
+        return default_codec.dumps(self.snapshot())
+
+    def reset(self) -> None:
+        """Clear all counters, which also restarts every budget."""
+        with self._lock:
+            self._counters.clear()
+            self._total = _Counter()
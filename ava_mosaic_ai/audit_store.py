@@ -0,0 +1,308 @@
+import hashlib
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ava_mosaic_ai.utils.json_codec import default_codec
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# internal header, requests carrying it are sent without an audit record, e.g. embeddings
+NO_AUDIT_HEADER = "x-mosaic-no-audit"
+# request body keys holding the response_model schema, identical across calls of a model
+SCHEMA_KEYS = ("tools", "functions", "response_format")
+# headers whose values repeat across requests of a client and are worth sharing
+SHARED_HEADER_VALUES = frozenset(
+    {
+        "accept",
+        "accept-encoding",
+        "access-control-expose-headers",
+        "alt-svc",
+        "anthropic-version",
+        "cf-cache-status",
+        "connection",
+        "content-encoding",
+        "content-type",
+        "host",
+        "openai-organization",
+        "openai-project",
+        "openai-version",
+        "server",
+        "strict-transport-security",
+        "transfer-encoding",
+        "user-agent",
+        "vary",
+        "x-content-type-options",
+    }
+)
+SHARED_HEADER_PREFIXES = ("x-stainless-", "x-ratelimit-limit-")
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    # compressor objects are not thread-safe, they are cheap to create
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def get_compression(
+    name: Optional[str],
+) -> Optional[Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    """(compress, decompress) functions for "zlib" or "zstd", None for no compression."""
+    if name is None:
+        return None
+    if name == "zlib":
+        return (lambda data: zlib.compress(data, ZLIB_LEVEL)), zlib.decompress
+    if name == "zstd":
+        if zstandard is None:
+            raise ImportError("Audit compression 'zstd' needs the zstandard package")
+        return _zstd_compress, _zstd_decompress
+    raise ValueError(f"Unknown audit compression: {name}, expected zlib or zstd")
+
+
+def _shared_value(name: str) -> bool:
+    return name in SHARED_HEADER_VALUES or name.startswith(SHARED_HEADER_PREFIXES)
+
+
+def _intern_headers(headers: Any) -> Tuple[str, ...]:
+    # flat (name, value, name, value, ...). Interned strings are never freed on
+    # CPython 3.12+, so only names and values known to repeat are interned, per
+    # request values such as trace ids, dates and credentials are kept as they are.
+    flat = []
+    for name, value in headers.items():
+        name = sys.intern(name)
+        flat.append(name)
+        flat.append(sys.intern(value) if _shared_value(name) else value)
+    return tuple(flat)
+
+
+class AuditRecord:
+    """
+    One request/response pair of a CustomHTTPXClient, kept in its compact form.
+
+    Bodies are the raw (optionally compressed) bytes, the request body without
+    its SCHEMA_KEYS, which live once per distinct value in the AuditStore and are
+    referenced by digest. Headers are None when the trace was not sampled.
+    """
+
+    __slots__ = (
+        "timestamp",
+        "method",
+        "url",
+        "status_code",
+        "request_headers",
+        "response_headers",
+        "request_body",
+        "response_body",
+        "schemas",
+    )
+
+    def __init__(
+        self,
+        timestamp: float,
+        method: str,
+        url: str,
+        status_code: int,
+        request_headers: Optional[Tuple[str, ...]] = None,
+        response_headers: Optional[Tuple[str, ...]] = None,
+        request_body: Optional[bytes] = None,
+        response_body: Optional[bytes] = None,
+        schemas: Tuple[Tuple[str, bytes], ...] = (),
+    ):
+        self.timestamp = timestamp
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.request_headers = request_headers
+        self.response_headers = response_headers
+        self.request_body = request_body
+        self.response_body = response_body
+        self.schemas = schemas
+
+
+class AuditStore:
+    """
+    Bounded, TTL-limited audit history of a CustomHTTPXClient, keyed by trace id.
+
+    Records are AuditRecords rather than parsed request and response dicts: header
+    names and the values in SHARED_HEADER_VALUES are interned, request bodies are stored once encoded with
+    their response_model schema (`tools`, `functions`, `response_format`)
+    deduplicated by hash, and with `compression` ("zlib", or "zstd" with the
+    zstandard package installed) bodies and schemas are compressed. `get` undoes
+    all of it and returns the same dicts the client used to keep.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl: float = 3600,
+        compression: Optional[str] = None,
+        json_codec: Any = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.compression = compression
+        self.json_codec = json_codec or default_codec
+        self._compress, self._decompress = get_compression(compression) or (None, None)
+        self._lock = threading.Lock()
+        self._records: "OrderedDict[str, AuditRecord]" = OrderedDict()
+        # digest -> [encoded schema, number of records referencing it]
+        self._schemas: Dict[bytes, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, trace_id: str) -> bool:
+        return trace_id in self._records
+
+    def _pack(self, data: bytes) -> bytes:
+        return self._compress(data) if self._compress is not None else data
+
+    def _unpack(self, data: bytes) -> bytes:
+        return self._decompress(data) if self._decompress is not None else data
+
+    def _parse(self, content: bytes) -> Any:
+        try:
+            return self.json_codec.loads(content)
+        except self.json_codec.decode_errors:
+            return content.decode(errors="replace")
+
+    def add(
+        self,
+        trace_id: str,
+        method: str,
+        url: str,
+        status_code: int,
+        request_headers: Any = None,
+        response_headers: Any = None,
+        request_content: Any = None,
+        response_content: Optional[bytes] = None,
+    ) -> None:
+        """
+        Record an exchange. `request_content` is the parsed request body, the
+        headers and contents are None for traces whose bodies are not captured.
+        """
+        schemas = []
+        # encoded schemas not stored yet, compressed outside the lock
+        new_schemas = {}
+        encoded_schemas = {}
+        request_body = None
+        if isinstance(request_content, dict):
+            remainder = dict(request_content)
+            for key in SCHEMA_KEYS:
+                if key in remainder:
+                    encoded = self.json_codec.dumps(remainder.pop(key)).encode()
+                    digest = hashlib.blake2b(encoded, digest_size=16).digest()
+                    schemas.append((sys.intern(key), digest))
+                    encoded_schemas[digest] = encoded
+                    if digest not in self._schemas:
+                        new_schemas[digest] = self._pack(encoded)
+            request_body = self._pack(self.json_codec.dumps(remainder).encode())
+        elif request_content is not None:
+            if not isinstance(request_content, bytes):
+                request_content = self.json_codec.dumps(request_content).encode()
+            request_body = self._pack(request_content)
+        record = AuditRecord(
+            time.time(),
+            sys.intern(method),
+            url,
+            status_code,
+            _intern_headers(request_headers) if request_headers is not None else None,
+            _intern_headers(response_headers) if response_headers is not None else None,
+            request_body,
+            self._pack(response_content) if response_content is not None else None,
+            tuple(schemas),
+        )
+        with self._lock:
+            for key, digest in record.schemas:
+                entry = self._schemas.get(digest)
+                if entry is None:
+                    # released by a concurrent call since the check above
+                    packed = new_schemas.get(digest)
+                    if packed is None:
+                        packed = self._pack(encoded_schemas[digest])
+                    entry = self._schemas[digest] = [packed, 0]
+                entry[1] += 1
+            previous = self._records.get(trace_id)
+            if previous is not None:
+                # retried attempts share the trace id, the last one is kept
+                self._release(previous)
+            elif len(self._records) >= self.max_size:
+                self._release(self._records.popitem(last=False)[1])
+            self._records[trace_id] = record
+
+    def _release(self, record: AuditRecord) -> None:
+        for _, digest in record.schemas:
+            entry = self._schemas[digest]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._schemas[digest]
+
+    def get(self, trace_id: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """The request and response data of `trace_id`, (None, None) if unknown or expired."""
+        with self._lock:
+            record = self._records.get(trace_id)
+            if record is None:
+                return None, None
+            if time.time() - record.timestamp > self.ttl:
+                self._release(self._records.pop(trace_id))
+                return None, None
+            schemas = [(key, self._schemas[digest][0]) for key, digest in record.schemas]
+
+        request_data: Dict[str, Any] = {"method": record.method, "url": record.url}
+        response_data: Dict[str, Any] = {"status_code": record.status_code}
+        if record.request_headers is not None:
+            headers = record.request_headers
+            request_data["headers"] = dict(zip(headers[::2], headers[1::2]))
+            content = None
+            if record.request_body is not None:
+                content = self._parse(self._unpack(record.request_body))
+                for key, schema in schemas:
+                    content[key] = self.json_codec.loads(self._unpack(schema))
+            request_data["content"] = content
+        if record.response_headers is not None:
+            headers = record.response_headers
+            response_data["headers"] = dict(zip(headers[::2], headers[1::2]))
+            response_data["content"] = self._parse(self._unpack(record.response_body))
+        return request_data, response_data
+
+    def clear_expired(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [
+                trace_id
+                for trace_id, record in self._records.items()
+                if now - record.timestamp > self.ttl
+            ]
+            for trace_id in expired:
+                self._release(self._records.pop(trace_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self._schemas.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Records, distinct schemas and the stored body and schema bytes."""
+        with self._lock:
+            body_bytes = sum(
+                len(record.request_body or b"") + len(record.response_body or b"")
+                for record in self._records.values()
+            )
+            schema_bytes = sum(len(entry[0]) for entry in self._schemas.values())
+            return {
+                "records": len(self._records),
+                "schemas": len(self._schemas),
+                "body_bytes": body_bytes,
+                "schema_bytes": schema_bytes,
+            }
@@ -0,0 +1,246 @@
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import instructor
+from pydantic import BaseModel
+
+from ava_mosaic_ai.deadline import DeadlineExceededError
+
+
+class CandidateStats:
+    """
+    Thread-safe per response_model counters of candidate generation.
+
+    `first_valid` counts calls whose first candidate validated, i.e. a single
+    sequential attempt would have been enough, `rescued` counts calls where only a
+    later candidate validated, i.e. sequential validation would have needed at
+    least one more round trip.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schemas: Dict[str, Dict[str, float]] = {}
+
+    def record(
+        self, schema: str, candidates: int, valid: int, first_valid: bool, latency: float
+    ) -> None:
+        """`candidates` counts the candidates validated, which can be fewer than requested."""
+        with self._lock:
+            stats = self._schemas.setdefault(
+                schema,
+                {
+                    "calls": 0,
+                    "candidates": 0,
+                    "valid": 0,
+                    "first_valid": 0,
+                    "rescued": 0,
+                    "failed": 0,
+                    "latency": 0.0,
+                },
+            )
+            stats["calls"] += 1
+            stats["candidates"] += candidates
+            stats["valid"] += valid
+            if first_valid:
+                stats["first_valid"] += 1
+            elif valid:
+                stats["rescued"] += 1
+            else:
+                stats["failed"] += 1
+            stats["latency"] += latency
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per schema counts, candidate validity, first/rescue rates and mean latency in seconds."""
+        with self._lock:
+            return {
+                schema: {
+                    **stats,
+                    "valid_rate": stats["valid"] / stats["candidates"],
+                    "first_valid_rate": stats["first_valid"] / stats["calls"],
+                    "rescue_rate": stats["rescued"] / stats["calls"],
+                    "mean_latency": stats["latency"] / stats["calls"],
+                }
+                for schema, stats in self._schemas.items()
+            }
+
+
+def vote(candidates: List[BaseModel]) -> BaseModel:
+    """Selection hook returning the most common candidate, ties go to the earliest."""
+    counts = Counter(candidate.model_dump_json() for candidate in candidates)
+    return max(candidates, key=lambda candidate: counts[candidate.model_dump_json()])
+
+
+def validate_choices(
+    response_model: Any, completion: Any, mode: Any
+) -> Tuple[List[Optional[BaseModel]], List[str]]:
+    """Validate every choice of an `n` > 1 completion, None for the invalid ones."""
+    schema = instructor.openai_schema(response_model)
+    results: List[Optional[BaseModel]] = []
+    errors = []
+    for choice in completion.choices:
+        single = completion.model_copy(update={"choices": [choice]})
+        try:
+            results.append(schema.from_response(single, mode=mode))
+        except Exception as exc:
+            results.append(None)
+            errors.append(f"{type(exc).__name__}: {exc}")
+    return results, errors
+
+
+# chosen candidate, whether the first one was valid, candidates validated,
+# valid candidates, validation errors and the last error raised
+_Outcome = Tuple[Optional[BaseModel], bool, int, int, List[str], Optional[Exception]]
+
+
+def _choose(
+    valid: List[BaseModel], select: Optional[Callable[[List[BaseModel]], BaseModel]]
+) -> Optional[BaseModel]:
+    if not valid:
+        return None
+    return select(valid) if select is not None else valid[0]
+
+
+def _run_n(
+    factory: Any,
+    response_model: Any,
+    messages: List[Dict[str, str]],
+    n: int,
+    select: Optional[Callable[[List[BaseModel]], BaseModel]],
+    kwargs: Dict[str, Any],
+) -> _Outcome:
+    # pick the trace id here, so the audit data is found even when the first choice fails
+    extra_headers = dict(kwargs.pop("extra_headers", None) or {})
+    trace_id = extra_headers.setdefault("x-trace-id", str(uuid.uuid4()))
+    start_time = time.time()
+    try:
+        first = factory.create_completion(
+            response_model,
+            messages,
+            extra_headers=extra_headers,
+            n=n,
+            max_retries=0,
+            **kwargs,
+        )
+        completion, audit_data, error = first._raw_response, first._audit_data, None
+    except DeadlineExceededError:
+        raise
+    except Exception as exc:
+        completion = getattr(exc, "last_completion", None)
+        if completion is None:
+            raise
+        request_data, response_data = factory.http_client.get_request_response_data(trace_id)
+        audit_data = {
+            "trace_id": trace_id,
+            "request_time": time.time() - start_time,
+            "http_request": request_data,
+            "http_response": response_data,
+        }
+        first, error = None, exc
+
+    results, errors = validate_choices(response_model, completion, factory.client.mode)
+    if first is not None:
+        # instructor validated the first choice already, keep its instance
+        results[0] = first
+    valid = [result for result in results if result is not None]
+    chosen = _choose(valid, select)
+    if chosen is not None and chosen is not first:
+        chosen.__dict__["_audit_data"] = audit_data
+    return chosen, results[0] is not None, len(results), len(valid), errors, error
+
+
+def _run_concurrent(
+    factory: Any,
+    response_model: Any,
+    messages: List[Dict[str, str]],
+    n: int,
+    select: Optional[Callable[[List[BaseModel]], BaseModel]],
+    kwargs: Dict[str, Any],
+) -> _Outcome:
+    # every candidate is its own request, with its own trace id and audit data
+    kwargs["extra_headers"] = {
+        name: value
+        for name, value in (kwargs.get("extra_headers") or {}).items()
+        if name not in ("x-trace-id", "x-portkey-trace-id")
+    }
+    # in completion order, the first one to arrive stands for a single sequential attempt
+    results: List[Optional[BaseModel]] = []
+    errors = []
+    last_error: Optional[Exception] = None
+    pool = ThreadPoolExecutor(max_workers=n)
+    pending = {
+        pool.submit(
+            factory.create_completion, response_model, messages, max_retries=0, **kwargs
+        )
+        for _ in range(n)
+    }
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    results.append(future.result())
+                except DeadlineExceededError:
+                    raise
+                except Exception as exc:
+                    results.append(None)
+                    errors.append(f"{type(exc).__name__}: {exc}")
+                    last_error = exc
+            if select is None and any(result is not None for result in results):
+                # first valid candidate wins, the others finish in the background
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+    valid = [result for result in results if result is not None]
+    chosen = _choose(valid, select)
+    return chosen, results[0] is not None, len(results), len(valid), errors, last_error
+
+
+def run_candidates(
+    factory: Any,
+    response_model: Any,
+    messages: List[Dict[str, str]],
+    n: int,
+    select: Optional[Callable[[List[BaseModel]], BaseModel]] = None,
+    **kwargs,
+) -> BaseModel:
+    """
+    Generate `n` candidates at once instead of re-asking sequentially, and return
+    the first valid one, or `select(valid_candidates)` when a selection hook is given.
+
+    Providers accepting the `n` parameter get a single request, others get `n`
+    concurrent requests. Candidate counts are added to the audit data under
+    "candidates" and aggregated per response_model in `candidate_stats`. When no
+    candidate validates the last error is raised.
+    """
+    if n < 2:
+        raise ValueError("Candidate generation needs at least two candidates")
+    # candidates replace the instructor re-asks
+    kwargs.pop("max_retries", None)
+    mode = "n" if factory.provider in factory.CANDIDATE_N_PROVIDERS else "concurrent"
+    run = _run_n if mode == "n" else _run_concurrent
+
+    start_time = time.time()
+    chosen, first_valid, checked, valid, errors, last_error = run(
+        factory, response_model, messages, n, select, kwargs
+    )
+    latency = time.time() - start_time
+
+    factory.candidate_stats.record(response_model.__name__, checked, valid, first_valid, latency)
+    if chosen is None:
+        raise last_error
+    audit_data = getattr(chosen, "_audit_data", None)
+    if audit_data is not None:
+        audit_data["candidates"] = {
+            "mode": mode,
+            "requested": n,
+            "valid": valid,
+            "errors": errors,
+        }
+    return chosen
@@ -0,0 +1,124 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from ava_mosaic_ai.deadline import DeadlineExceededError, resolve_deadline
+
+
+class CascadeTier(BaseModel):
+    """One tier of a model cascade, tried in order from cheapest to strongest."""
+
+    # model for this tier, defaults to the provider's default_model
+    model: Optional[str] = None
+    # LLMProvider value, defaults to the provider of the factory running the cascade
+    provider: Optional[str] = None
+    # attempts on this tier before escalating, the first one plus instructor re-asks
+    attempts: int = Field(default=1, ge=1)
+    # extra create_completion arguments for this tier, e.g. temperature
+    kwargs: Dict[str, Any] = Field(default_factory=dict)
+
+
+class CascadeStats:
+    """Thread-safe per tier counters of cascade outcomes and latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers: Dict[str, Dict[str, float]] = {}
+
+    def record(self, tier: str, outcome: str, latency: float) -> None:
+        with self._lock:
+            stats = self._tiers.setdefault(
+                tier,
+                {"calls": 0, "accepted": 0, "rejected": 0, "errors": 0, "latency": 0.0},
+            )
+            stats["calls"] += 1
+            stats["errors" if outcome == "error" else outcome] += 1
+            stats["latency"] += latency
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per tier calls, outcome counts, success rate and mean latency in seconds."""
+        with self._lock:
+            return {
+                tier: {
+                    **stats,
+                    "success_rate": stats["accepted"] / stats["calls"],
+                    "mean_latency": stats["latency"] / stats["calls"],
+                }
+                for tier, stats in self._tiers.items()
+            }
+
+
+def _default_accept(result: BaseModel) -> bool:
+    # response models can implement a `cascade_accept` confidence check
+    accept = getattr(result, "cascade_accept", None)
+    return accept() if callable(accept) else True
+
+
+def run_cascade(
+    factory: Any,
+    response_model: Any,
+    messages: List[Dict[str, str]],
+    tiers: List[CascadeTier],
+    accept: Optional[Callable[[BaseModel], bool]] = None,
+    **kwargs,
+) -> BaseModel:
+    """
+    Try each tier in order and return the first result that validates and passes
+    `accept`. A tier is escalated when its attempts fail validation, it errors, or
+    `accept` rejects its result. When no tier is accepted the last rejected
+    result is returned, and when every tier errored the last error is raised.
+    """
+    if not tiers:
+        raise ValueError("A cascade needs at least one tier")
+    accept = accept or _default_accept
+    # the deadline bounds the whole cascade, not each tier
+    kwargs["deadline"] = resolve_deadline(kwargs.pop("timeout", None), kwargs.get("deadline"))
+    report = []
+    accepted = rejected = None
+    last_error: Optional[Exception] = None
+    for index, tier in enumerate(tiers):
+        llm = factory._get_cascade_factory(tier.provider)
+        model = tier.model or llm.settings.default_model
+        tier_name = f"{llm.provider.value}/{model}"
+        params = {**kwargs, **tier.kwargs, "model": model, "max_retries": tier.attempts - 1}
+
+        start_time = time.time()
+        error = None
+        try:
+            result = llm.create_completion(
+                response_model=response_model, messages=messages, **params
+            )
+            outcome = "accepted" if accept(result) else "rejected"
+        except DeadlineExceededError:
+            raise
+        except Exception as exc:
+            outcome, error, last_error = "error", f"{type(exc).__name__}: {exc}", exc
+        latency = time.time() - start_time
+
+        factory.cascade_stats.record(tier_name, outcome, latency)
+        report.append(
+            {
+                "tier": index,
+                "provider": llm.provider.value,
+                "model": model,
+                "attempts": tier.attempts,
+                "outcome": outcome,
+                "latency": latency,
+                "error": error,
+            }
+        )
+        if outcome == "accepted":
+            accepted = result
+            break
+        if outcome == "rejected":
+            rejected = result
+
+    result = accepted if accepted is not None else rejected
+    if result is None:
+        raise last_error
+    audit_data = getattr(result, "_audit_data", None)
+    if audit_data is not None:
+        audit_data["cascade"] = report
+    return result
@@ -0,0 +1,337 @@
+import argparse
+import importlib
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from ava_mosaic_ai.utils.json_codec import default_codec
+
+# sentinel marking the end of a queue
+_DONE = None
+# how often a blocked feeder checks that the workers are still alive, in seconds
+_LIVENESS_INTERVAL = 0.5
+
+
+class WorkerError(RuntimeError):
+    """Raised by run_batch when a worker exits before finishing its tasks."""
+
+
+def import_object(path: str) -> Any:
+    """Import an object from `package.module:Name` or `package.module.Name`."""
+    module_name, sep, attr = path.partition(":")
+    if not sep:
+        module_name, _, attr = path.rpartition(".")
+    if not module_name or not attr:
+        raise ValueError(f"Invalid import path: {path}")
+    obj = importlib.import_module(module_name)
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+class BatchCheckpoint:
+    """
+    Tracks which input lines have been written, so an interrupted run can resume.
+
+    Completed lines are stored as a watermark (every line below it is done) plus
+    the few lines above it that finished out of order, which keeps the checkpoint
+    small regardless of the input size.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.watermark = 0
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                state = default_codec.loads(f.read())
+            self.watermark = state["watermark"]
+            self.done = set(state["done"])
+
+    def is_done(self, line: int) -> bool:
+        return line < self.watermark or line in self.done
+
+    def mark_done(self, line: int) -> None:
+        self.done.add(line)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(
+                default_codec.dumps(
+                    {"watermark": self.watermark, "done": sorted(self.done)}
+                )
+            )
+        os.replace(tmp_path, self.path)
+
+
+def _read_tasks(path: str, checkpoint: BatchCheckpoint) -> Iterator[Tuple[int, bytes]]:
+    with open(path, "rb") as f:
+        for line_number, line in enumerate(f):
+            if not checkpoint.is_done(line_number):
+                yield line_number, line
+
+
+def _process_line(
+    llm: Any,
+    line: bytes,
+    default_response_model: Optional[str],
+    response_models: Dict[str, Type[BaseModel]],
+) -> Tuple[Dict, Optional[Dict]]:
+    record = default_codec.loads(line)
+    model_path = record.get("response_model", default_response_model)
+    if model_path is None:
+        raise ValueError("No response_model given for record or on the command line")
+    if model_path not in response_models:
+        response_models[model_path] = import_object(model_path)
+
+    result = llm.create_completion(
+        response_model=response_models[model_path],
+        messages=record["messages"],
+        **record.get("kwargs", {}),
+    )
+    audit_data = llm.get_audit_data(result)
+    output = {
+        "id": record.get("id"),
+        "trace_id": llm.get_trace_id(result),
+        "result": result.model_dump(mode="json"),
+    }
+    return output, audit_data
+
+
+def _worker_main(
+    provider: str,
+    metadata: Optional[Dict],
+    default_response_model: Optional[str],
+    concurrency: int,
+    tasks: Any,
+    results: Any,
+) -> None:
+    """Run one worker: a factory with `concurrency` requests in flight."""
+    from ava_mosaic_ai.llm_factory import LLMFactory
+
+    llm = LLMFactory(provider, metadata=metadata)
+    response_models = {}
+    in_flight = threading.BoundedSemaphore(concurrency)
+
+    def run(line_number: int, line: bytes) -> None:
+        try:
+            if not line.strip():
+                results.put((line_number, None, None, False))
+                return
+            output, audit_data = _process_line(
+                llm, line, default_response_model, response_models
+            )
+            output["line"] = line_number
+            audit = None
+            if audit_data is not None:
+                audit = default_codec.dumps(
+                    {"line": line_number, "trace_id": output["trace_id"], "audit": audit_data}
+                )
+            results.put((line_number, default_codec.dumps(output), audit, False))
+        except Exception as exc:
+            error = {"line": line_number, "error": f"{type(exc).__name__}: {exc}"}
+            results.put((line_number, default_codec.dumps(error), None, True))
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            task = tasks.get()
+            if task is _DONE:
+                break
+            in_flight.acquire()
+            pool.submit(run, *task)
+
+
+def _write_results(
+    results: Any,
+    output_path: str,
+    audit_path: Optional[str],
+    checkpoint: BatchCheckpoint,
+    checkpoint_interval: float,
+    stats: Dict[str, int],
+) -> None:
+    output = open(output_path, "a")
+    audit = open(audit_path, "a") if audit_path else None
+    last_save = time.monotonic()
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            line_number, record, audit_record, failed = item
+            if record is not None:
+                output.write(record + "\n")
+                stats["errors" if failed else "ok"] += 1
+            if audit is not None and audit_record is not None:
+                audit.write(audit_record + "\n")
+            checkpoint.mark_done(line_number)
+            if time.monotonic() - last_save >= checkpoint_interval:
+                # flush outputs before the checkpoint claims the lines are done
+                output.flush()
+                if audit is not None:
+                    audit.flush()
+                checkpoint.save()
+                last_save = time.monotonic()
+    finally:
+        output.close()
+        if audit is not None:
+            audit.close()
+        checkpoint.save()
+
+
+def _check_workers(processes: List[Any], all_done: bool = False) -> None:
+    """Raise WorkerError when a worker died, or exited before `all_done` tasks were queued."""
+    for index, process in enumerate(processes):
+        exitcode = getattr(process, "exitcode", None)
+        if exitcode or (not all_done and not process.is_alive()):
+            detail = f" with exit code {exitcode}" if exitcode is not None else ""
+            raise WorkerError(
+                f"Worker {index} exited{detail} before finishing its tasks, "
+                "run again to resume from the checkpoint"
+            )
+
+
+def _put_task(tasks: Any, task: Any, processes: List[Any]) -> None:
+    """Queue a task, failing instead of blocking forever once a worker has died."""
+    while True:
+        _check_workers(processes)
+        try:
+            tasks.put(task, timeout=_LIVENESS_INTERVAL)
+            return
+        except queue.Full:
+            continue
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    provider: str,
+    response_model: Optional[str] = None,
+    audit_path: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+    workers: int = 1,
+    concurrency: int = 8,
+    metadata: Optional[Dict] = None,
+    checkpoint_interval: float = 5.0,
+) -> Dict[str, int]:
+    """
+    Stream `input_path` through `workers` processes, each with `concurrency`
+    requests in flight, and append results to `output_path`.
+
+    With `workers=0` everything runs in the current process, which is mostly
+    useful for debugging. Failed lines are written as `error` records and count
+    as done. Results are written at least once: lines finished after the last
+    checkpoint are processed again when the run is resumed. A worker that dies,
+    e.g. because its LLMFactory cannot be created, stops the run with
+    WorkerError; its unfinished lines are picked up on resume.
+    """
+    checkpoint = BatchCheckpoint(checkpoint_path or f"{output_path}.checkpoint")
+    stats = {"ok": 0, "errors": 0}
+    queue_size = max(1, workers) * concurrency * 2
+
+    if workers > 0:
+        context = multiprocessing.get_context("spawn")
+        tasks = context.Queue(maxsize=queue_size)
+        results = context.Queue()
+        start_worker = context.Process
+    else:
+        tasks = queue.Queue(maxsize=queue_size)
+        results = queue.Queue()
+        start_worker = threading.Thread
+
+    writer = threading.Thread(
+        target=_write_results,
+        args=(results, output_path, audit_path, checkpoint, checkpoint_interval, stats),
+    )
+    writer.start()
+    worker_args = (provider, metadata, response_model, concurrency, tasks, results)
+    processes: List[Any] = [
+        start_worker(target=_worker_main, args=worker_args, daemon=True)
+        for _ in range(max(1, workers))
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        for task in _read_tasks(input_path, checkpoint):
+            _put_task(tasks, task, processes)
+        for _ in processes:
+            _put_task(tasks, _DONE, processes)
+        for process in processes:
+            process.join()
+        # a worker that died after the last task was queued lost its in-flight lines
+        _check_workers(processes, all_done=True)
+    except BaseException:
+        for process in processes:
+            if hasattr(process, "terminate"):
+                process.terminate()
+        raise
+    finally:
+        results.put(_DONE)
+        writer.join()
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="ava-mosaic")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser(
+        "batch",
+        help="Run structured completions for every line of a JSONL file",
+        description=(
+            "Each input line is a JSON object with `messages`, and optionally `id`, "
+            "`response_model` (import path) and `kwargs` for create_completion."
+        ),
+    )
+    batch.add_argument("input", help="Input JSONL file")
+    batch.add_argument("-o", "--output", required=True, help="Output JSONL file")
+    batch.add_argument("-p", "--provider", required=True, help="LLM provider name")
+    batch.add_argument(
+        "-m", "--response-model", help="Default response model, e.g. my_pkg.models:User"
+    )
+    batch.add_argument("--audit-output", help="Write audit records to this JSONL file")
+    batch.add_argument(
+        "--checkpoint", help="Checkpoint file, defaults to <output>.checkpoint"
+    )
+    batch.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    batch.add_argument(
+        "-c", "--concurrency", type=int, default=8, help="In-flight requests per worker"
+    )
+    batch.add_argument("--metadata", help="JSON metadata passed to every LLMFactory")
+
+    args = parser.parse_args(argv)
+    sys.path.insert(0, os.getcwd())
+    try:
+        stats = run_batch(
+            args.input,
+            args.output,
+            provider=args.provider,
+            response_model=args.response_model,
+            audit_path=args.audit_output,
+            checkpoint_path=args.checkpoint,
+            workers=args.workers,
+            concurrency=args.concurrency,
+            metadata=default_codec.loads(args.metadata) if args.metadata else None,
+        )
+    except WorkerError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    print(f"Completed {stats['ok']} records, {stats['errors']} errors")
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from typing import Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from enum import Enum
 from pydantic import BaseModel, Field
 from functools import lru_cache
@@ -18,48 +18,166 @@ class LLMProvider(str, Enum):
     PORTKEY_AZURE_OPENAI = "portkey_azure"
     PORTKEY_ANTHROPIC = "portkey_anthropic"
 
+    # local OpenAI compatible backend for load and chaos tests, see ava_mosaic_ai.mock_provider
+    MOCK = "mock"
+
 
 class LLMProviderSettings(BaseModel):
     temperature: float = 0.0
     max_tokens: Optional[int] = None
+    # size max_tokens from the response_model and observed usage instead of max_tokens,
+    # see ava_mosaic_ai.token_budget.TokenBudgetEstimator, enabled with AUTO_MAX_TOKENS=true
+    auto_max_tokens: bool = Field(default_factory=lambda: _get_env_flag("AUTO_MAX_TOKENS"))
     max_retries: int = 3
+    # per attempt timeouts, a create_completion deadline can only shorten them
+    connect_timeout: float = Field(default=5.0)
+    read_timeout: float = Field(default=600.0)
+    # connection warm-up at factory startup, see LLMFactory.warm_up
+    warmup_connections: int = Field(default=0)
+    # keep warm connections alive, should be shorter than keepalive_expiry
+    warmup_probe_interval: Optional[float] = None
+    keepalive_expiry: float = Field(default=5.0)
+    # key pool, see ava_mosaic_ai.key_pool.APIKeyPool
+    key_selection: str = Field(default="round_robin")
+    key_cooldown: float = Field(default=60.0)
+    # share of traces whose spans are exported and whose full bodies are audited
+    trace_sample_rate: float = Field(default=1.0, ge=0.0, le=1.0)
+    # "zlib" or "zstd" compression of audited bodies, see ava_mosaic_ai.audit_store.AuditStore
+    audit_compression: Optional[str] = None
+
+
+class EmbeddingSettings(BaseModel):
+    # see ava_mosaic_ai.embeddings.create_embeddings
+    embedding_model: Optional[str] = None
+    embedding_batch_size: int = Field(default=2048)
+    embedding_concurrency: int = Field(default=4)
 
 
-class OpenAISettings(LLMProviderSettings):
+class OpenAISettings(LLMProviderSettings, EmbeddingSettings):
     api_key: str
+    api_keys: List[str] = Field(default_factory=list)
     default_model: str = Field(default="gpt-4o")
+    embedding_model: Optional[str] = Field(default="text-embedding-3-small")
 
 
 class AnthropicSettings(LLMProviderSettings):
     api_key: str
+    api_keys: List[str] = Field(default_factory=list)
     default_model: str = Field(default="claude-3-sonnet-20240229")
     max_tokens: int = Field(default=1024)
 
 
-class LlamaSettings(LLMProviderSettings):
+class EndpointSettings(BaseModel):
+    url: str
+    weight: float = Field(default=1.0, gt=0)
+    # extra headers for this endpoint only, e.g. the api-key of an azure region
+    headers: Dict[str, str] = Field(default_factory=dict)
+    # azure deployment name when it differs from the default deployment
+    deployment: Optional[str] = None
+
+
+class MultiEndpointSettings(LLMProviderSettings):
+    # see ava_mosaic_ai.load_balancer.EndpointBalancer
+    endpoints: List[EndpointSettings] = Field(default_factory=list)
+    load_balancing: str = Field(default="weighted_round_robin")
+    health_check_interval: Optional[float] = None
+    health_check_path: str = Field(default="")
+    outlier_consecutive_failures: int = Field(default=5)
+    outlier_ejection_time: float = Field(default=30.0)
+
+
+class LlamaSettings(MultiEndpointSettings, EmbeddingSettings):
     api_key: str = Field(default="key")  # required, but not used
     default_model: str = Field(default="llama3")
+    embedding_model: Optional[str] = Field(default="nomic-embed-text")
+    embedding_batch_size: int = Field(default=256)
     base_url: str = Field(default="http://localhost:11434/v1")
+    connect_timeout: float = Field(default=2.0)
 
 
-class AzureOpenAISettings(LLMProviderSettings):
+class AzureOpenAISettings(MultiEndpointSettings, EmbeddingSettings):
     api_key: str
     api_version: str = Field(default="2024-02-15-preview")
     default_model: str = Field(default="gpt-4o")
     azure_endpoint: str
     
-class PortkeyAzureOpenAISettings(LLMProviderSettings):
+class PortkeyAzureOpenAISettings(LLMProviderSettings, EmbeddingSettings):
     api_key: str 
     virtual_api_key: str
+    virtual_api_keys: List[str] = Field(default_factory=list)
     default_model: str = Field(default="gpt-4o")
+    embedding_model: Optional[str] = Field(default="text-embedding-3-small")
     
 class PortkeyAnthropicSettings(LLMProviderSettings):
     api_key: str
     virtual_api_key: str
+    virtual_api_keys: List[str] = Field(default_factory=list)
     default_model: str = Field(default="claude-3-5-sonnet-20240620")
     max_tokens: int = Field(default=1024)
 
 
+class MockSettings(LLMProviderSettings):
+    api_key: str = Field(default="mock")  # required, but not used
+    default_model: str = Field(default="mock-model")
+    base_url: str = Field(default="http://mock.ava-mosaic.local/v1")
+    # "fixed", "lognormal" (median `latency`, `latency_sigma`) or "recorded" (`latency_samples`)
+    latency_distribution: str = Field(default="fixed")
+    latency: float = Field(default=0.0, ge=0)
+    latency_sigma: float = Field(default=0.5, ge=0)
+    latency_samples: List[float] = Field(default_factory=list)
+    # share of requests answered with a 429 or a 500
+    rate_limit_rate: float = Field(default=0.0, ge=0.0, le=1.0)
+    error_rate: float = Field(default=0.0, ge=0.0, le=1.0)
+    retry_after: float = Field(default=1.0, ge=0)
+    # reported token usage, estimated from the request and response sizes when None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    seed: Optional[int] = None
+
+
+def _get_env_list(name: str) -> List[str]:
+    """Read a comma separated list of values from the environment."""
+    value = os.environ.get(name, "")
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _get_env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean flag such as `true`, `1` or `yes` from the environment."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _get_env_endpoints(
+    name: str, key_header: Optional[Tuple[str, str]] = None
+) -> List[EndpointSettings]:
+    """
+    Read endpoints from a comma separated list of `url|weight|deployment|api_key`
+    values, where every field after the url is optional and may be left empty,
+    e.g. `https://eastus.example.com||gpt-4o-east|<key>`. An api_key is sent in
+    the `key_header` (name, value template) of its endpoint only.
+    """
+    endpoints = []
+    for item in _get_env_list(name):
+        url, weight, deployment, api_key = (item.split("|", 3) + ["", "", ""])[:4]
+        headers = {}
+        if api_key.strip():
+            if key_header is None:
+                raise ValueError(f"{name} does not support per endpoint api keys")
+            header, template = key_header
+            headers[header] = template.format(key=api_key.strip())
+        endpoints.append(
+            EndpointSettings(
+                url=url.strip(),
+                weight=float(weight) if weight.strip() else 1.0,
+                deployment=deployment.strip() or None,
+                headers=headers,
+            )
+        )
+    return endpoints
+
+
 class Settings(BaseModel):
     app_name: str = Field(default="GenAI Project Template")
     _providers: Dict[LLMProvider, Any] = {}
@@ -67,19 +185,28 @@ class Settings(BaseModel):
     def get_provider_settings(self, provider: LLMProvider) -> Any:
         if provider not in self._providers:
             if provider == LLMProvider.OPENAI:
-                api_key = os.getenv("OPENAI_API_KEY")
+                api_keys = _get_env_list("OPENAI_API_KEYS")
+                api_key = os.getenv("OPENAI_API_KEY") or next(iter(api_keys), None)
                 if not api_key:
                     raise ValueError("OPENAI_API_KEY environment variable is not set")
-                self._providers[provider] = OpenAISettings(api_key=api_key)
+                self._providers[provider] = OpenAISettings(
+                    api_key=api_key, api_keys=api_keys
+                )
             elif provider == LLMProvider.ANTHROPIC:
-                api_key = os.getenv("ANTHROPIC_API_KEY")
+                api_keys = _get_env_list("ANTHROPIC_API_KEYS")
+                api_key = os.getenv("ANTHROPIC_API_KEY") or next(iter(api_keys), None)
                 if not api_key:
                     raise ValueError(
                         "ANTHROPIC_API_KEY environment variable is not set"
                     )
-                self._providers[provider] = AnthropicSettings(api_key=api_key)
+                self._providers[provider] = AnthropicSettings(
+                    api_key=api_key, api_keys=api_keys
+                )
             elif provider == LLMProvider.LLAMA:
-                self._providers[provider] = LlamaSettings()
+                endpoints = _get_env_endpoints(
+                    "LLAMA_BASE_URLS", key_header=("authorization", "Bearer {key}")
+                )
+                self._providers[provider] = LlamaSettings(endpoints=endpoints)
             elif provider == LLMProvider.AZURE_OPENAI:
                 endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
                 api_key = os.environ.get("AZURE_OPENAI_API_KEY")
@@ -97,16 +224,42 @@ class Settings(BaseModel):
                     api_key=api_key,
                     azure_endpoint=endpoint,
                     default_model=deployment_name,
+                    # azure keys are per resource, every region needs its own
+                    endpoints=_get_env_endpoints(
+                        "AZURE_OPENAI_ENDPOINTS", key_header=("api-key", "{key}")
+                    ),
+                    embedding_model=os.environ.get(
+                        "AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"
+                    ),
                 )
             elif provider == LLMProvider.PORTKEY_AZURE_OPENAI:
                 api_key = os.environ.get("PORTKEY_API_KEY")
-                virtual_api_key = os.environ.get("PORTKEY_AZURE_OPENAI_VIRTUAL_API_KEY")        
-                self._providers[provider] = PortkeyAzureOpenAISettings(api_key=api_key, virtual_api_key=virtual_api_key)
+                virtual_api_keys = _get_env_list("PORTKEY_AZURE_OPENAI_VIRTUAL_API_KEYS")
+                virtual_api_key = os.environ.get("PORTKEY_AZURE_OPENAI_VIRTUAL_API_KEY") or next(iter(virtual_api_keys), None)
+                self._providers[provider] = PortkeyAzureOpenAISettings(api_key=api_key, virtual_api_key=virtual_api_key, virtual_api_keys=virtual_api_keys)
                 
             elif provider == LLMProvider.PORTKEY_ANTHROPIC:
                 api_key = os.environ.get("PORTKEY_API_KEY")
-                virtual_api_key = os.environ.get("PORTKEY_ANTHROPIC_VIRTUAL_API_KEY")
-                self._providers[provider] = PortkeyAnthropicSettings(api_key=api_key, virtual_api_key=virtual_api_key)   
+                virtual_api_keys = _get_env_list("PORTKEY_ANTHROPIC_VIRTUAL_API_KEYS")
+                virtual_api_key = os.environ.get("PORTKEY_ANTHROPIC_VIRTUAL_API_KEY") or next(iter(virtual_api_keys), None)
+                self._providers[provider] = PortkeyAnthropicSettings(api_key=api_key, virtual_api_key=virtual_api_key, virtual_api_keys=virtual_api_keys)   
+            elif provider == LLMProvider.MOCK:
+                env = {
+                    field: os.environ[f"MOCK_{field.upper()}"]
+                    for field in (
+                        "latency_distribution",
+                        "latency",
+                        "latency_sigma",
+                        "rate_limit_rate",
+                        "error_rate",
+                        "seed",
+                    )
+                    if f"MOCK_{field.upper()}" in os.environ
+                }
+                self._providers[provider] = MockSettings(
+                    latency_samples=[float(v) for v in _get_env_list("MOCK_LATENCY_SAMPLES")],
+                    **env,
+                )
         return self._providers[provider]
 
 
@@ -0,0 +1,141 @@
+import email.utils
+import time
+from json import JSONDecodeError
+from typing import Optional
+
+import httpx
+from pydantic import ValidationError
+from tenacity import RetryCallState, Retrying, retry_if_exception_type, stop_after_attempt
+from tenacity.stop import stop_base
+
+try:
+    from instructor.core import AsyncValidationError, ResponseParsingError
+except ImportError:  # instructor < 1.10 re-asks on validation and JSON errors only
+    RETRYABLE_ERRORS = (ValidationError, JSONDecodeError)
+else:
+    # the errors instructor re-asks on without a deadline
+    RETRYABLE_ERRORS = (
+        ValidationError,
+        JSONDecodeError,
+        AsyncValidationError,
+        ResponseParsingError,
+    )
+
+# absolute time.monotonic() deadline of the call, consumed by CustomHTTPXClient
+DEADLINE_HEADER = "x-mosaic-deadline"
+
+# when the OpenAI and Anthropic SDKs retry a response, see sdk_retry_delay
+SDK_RETRY_STATUS_CODES = (408, 409, 429)
+SDK_MAX_RETRY_AFTER = 60.0
+SDK_INITIAL_RETRY_DELAY = 0.5
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised by create_completion when its deadline passes."""
+
+
+class DeadlineCancelled(BaseException):
+    """
+    Raised by CustomHTTPXClient once the deadline has passed.
+
+    It derives from BaseException, like asyncio.CancelledError, so it is not
+    swallowed and retried by the SDK or instructor retry loops.
+    LLMFactory turns it into a DeadlineExceededError.
+    """
+
+
+def remaining(deadline: float) -> float:
+    return deadline - time.monotonic()
+
+
+def clamp_request_timeout(request: httpx.Request, deadline: float) -> None:
+    """Cap every phase timeout of the request by the budget left before the deadline."""
+    budget = remaining(deadline)
+    if budget <= 0:
+        raise DeadlineCancelled("deadline exceeded before sending the request")
+    timeout = dict(request.extensions.get("timeout") or {})
+    for phase in ("connect", "read", "write", "pool"):
+        value = timeout.get(phase)
+        timeout[phase] = budget if value is None else min(value, budget)
+    request.extensions["timeout"] = timeout
+
+
+def _retry_after(headers: httpx.Headers) -> Optional[float]:
+    try:
+        return float(headers["retry-after-ms"]) / 1000
+    except (KeyError, ValueError):
+        pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def sdk_retry_delay(response: httpx.Response) -> Optional[float]:
+    """
+    Seconds the provider SDK waits before retrying `response`, None when it does
+    not retry it. Without a usable retry-after it is the SDK's first backoff,
+    later backoffs are longer.
+    """
+    retry_after = _retry_after(response.headers)
+    if retry_after is not None and retry_after > SDK_MAX_RETRY_AFTER:
+        return None
+    should_retry = response.headers.get("x-should-retry")
+    if should_retry == "false":
+        return None
+    if (
+        should_retry != "true"
+        and response.status_code not in SDK_RETRY_STATUS_CODES
+        and response.status_code < 500
+    ):
+        return None
+    if retry_after is not None and retry_after > 0:
+        return retry_after
+    return SDK_INITIAL_RETRY_DELAY
+
+
+def check_retry_fits(response: httpx.Response, deadline: float) -> None:
+    """Cancel the call when the SDK would still be waiting to retry `response` at the deadline."""
+    delay = sdk_retry_delay(response)
+    if delay is not None and remaining(deadline) <= delay:
+        raise DeadlineCancelled(
+            f"deadline exceeded: retrying a {response.status_code} response takes {delay:.1f}s"
+        )
+
+
+class stop_if_deadline_cannot_fit_attempt(stop_base):
+    """Stop retrying when the average attempt so far would not finish before the deadline."""
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+
+    def __call__(self, retry_state: RetryCallState) -> bool:
+        average_attempt = retry_state.seconds_since_start / retry_state.attempt_number
+        return remaining(self.deadline) < average_attempt
+
+
+def deadline_retrying(max_retries: int, deadline: float) -> Retrying:
+    """instructor retry policy for `max_retries` re-asks bounded by `deadline`."""
+    return Retrying(
+        stop=stop_after_attempt(max(max_retries, 0) + 1)
+        | stop_if_deadline_cannot_fit_attempt(deadline),
+        retry=retry_if_exception_type(RETRYABLE_ERRORS),
+        reraise=True,
+    )
+
+
+def resolve_deadline(
+    timeout: Optional[float] = None, deadline: Optional[float] = None
+) -> Optional[float]:
+    """Combine a relative timeout and an absolute time.monotonic() deadline, earliest wins."""
+    if timeout is not None:
+        timeout_deadline = time.monotonic() + timeout
+        deadline = timeout_deadline if deadline is None else min(deadline, timeout_deadline)
+    return deadline
@@ -0,0 +1,126 @@
+import base64
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, List, Optional
+
+from ava_mosaic_ai.audit_store import NO_AUDIT_HEADER
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for embeddings
+    np = None
+
+if TYPE_CHECKING:
+    import numpy
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError(
+            "numpy is required for embeddings, install it with "
+            "`pip install ava-mosaic-ai[embeddings]`"
+        )
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of embedding vectors keyed by model and content hash."""
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._cache: "OrderedDict[bytes, numpy.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{text}".encode()).digest()
+
+    def get(self, key: bytes) -> Optional["numpy.ndarray"]:
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+            return vector
+
+    def put(self, key: bytes, vector: "numpy.ndarray") -> None:
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+def _decode_embeddings(data: List[Any]) -> "numpy.ndarray":
+    """Decode the `data` list of an embeddings response into a float32 matrix."""
+    data = sorted(data, key=lambda item: item.index)
+    first = data[0].embedding
+    if isinstance(first, str):
+        # base64 encoded little endian float32, decode without python lists
+        raw = b"".join(base64.b64decode(item.embedding) for item in data)
+        return np.frombuffer(raw, dtype="<f4").reshape(len(data), -1)
+    return np.asarray([item.embedding for item in data], dtype=np.float32)
+
+
+def create_embeddings(
+    client: Any,
+    texts: List[str],
+    model: str,
+    batch_size: int,
+    max_concurrency: int,
+    cache: Optional[EmbeddingCache] = None,
+    **kwargs,
+) -> "numpy.ndarray":
+    """
+    Embed `texts` with an OpenAI compatible SDK client.
+
+    Inputs are split into batches of at most `batch_size`, sent concurrently and
+    written into one contiguous (len(texts), dim) float32 matrix.
+    """
+    _require_numpy()
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    use_cache = cache is not None
+    keys = [EmbeddingCache.key(model, text) for text in texts] if use_cache else None
+    cached = {}
+    pending = []
+    for i, text in enumerate(texts):
+        vector = cache.get(keys[i]) if use_cache else None
+        if vector is None:
+            pending.append(i)
+        else:
+            cached[i] = vector
+
+    def embed(positions: List[int]) -> "numpy.ndarray":
+        response = client.embeddings.create(
+            model=model,
+            input=[texts[i] for i in positions],
+            encoding_format="base64",
+            # nobody reads these records, and the base64 responses run to megabytes
+            extra_headers={"x-trace-id": str(uuid.uuid4()), NO_AUDIT_HEADER: "1"},
+            **kwargs,
+        )
+        return _decode_embeddings(response.data)
+
+    batches = [pending[i : i + batch_size] for i in range(0, len(pending), batch_size)]
+    output = None
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as pool:
+        for positions, vectors in zip(batches, pool.map(embed, batches)):
+            if output is None:
+                output = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            output[positions] = vectors
+            if use_cache:
+                for i in positions:
+                    cache.put(keys[i], output[i].copy())
+
+    if output is None:
+        dim = next(iter(cached.values())).shape[0]
+        output = np.empty((len(texts), dim), dtype=np.float32)
+    for i, vector in cached.items():
+        output[i] = vector
+    return output
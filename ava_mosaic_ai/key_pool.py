@@ -0,0 +1,127 @@
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+
+class APIKeyPool:
+    """
+    Thread-safe pool of API keys that picks a key for every outgoing request.
+
+    The pool is installed as a request hook on `CustomHTTPXClient`, so the
+    credential header is rewritten per HTTP attempt and keys can be rotated
+    without rebuilding the SDK client or the instructor patch.
+    """
+
+    STRATEGIES = ("round_robin", "least_recently_throttled")
+
+    def __init__(
+        self,
+        keys: List[str],
+        header_name: str,
+        header_format: str = "{key}",
+        strategy: str = "round_robin",
+        cooldown: float = 60.0,
+    ):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(
+                f"Unsupported key selection strategy: {strategy}, "
+                f"expected one of {self.STRATEGIES}"
+            )
+        self.header_name = header_name
+        self.header_format = header_format
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.set_keys(keys)
+
+    def set_keys(self, keys: List[str]) -> None:
+        """Replace the keys in the pool, in-flight requests are not affected."""
+        keys = [key for key in dict.fromkeys(keys) if key]
+        if not keys:
+            raise ValueError("APIKeyPool requires at least one API key")
+        with self._lock:
+            self._keys = keys
+            self._counter = itertools.count()
+            self._cooldown_until: Dict[str, float] = {key: 0.0 for key in keys}
+            self._last_throttled: Dict[str, float] = {key: 0.0 for key in keys}
+            self._last_used: Dict[str, float] = {key: 0.0 for key in keys}
+            self._requests: Dict[str, int] = {key: 0 for key in keys}
+            self._throttles: Dict[str, int] = {key: 0 for key in keys}
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._keys)
+
+    def acquire(self) -> str:
+        """Select the key to use for the next request."""
+        with self._lock:
+            now = time.monotonic()
+            available = [k for k in self._keys if self._cooldown_until[k] <= now]
+            if not available:
+                # every key is cooling down, use the one that recovers first
+                key = min(self._keys, key=self._cooldown_until.__getitem__)
+            elif self.strategy == "round_robin":
+                key = available[next(self._counter) % len(available)]
+            else:
+                key = min(
+                    available,
+                    key=lambda k: (self._last_throttled[k], self._last_used[k]),
+                )
+            self._last_used[key] = now
+            self._requests[key] += 1
+            return key
+
+    def mark_throttled(self, key: str, retry_after: Optional[float] = None) -> None:
+        """Put a key into cooldown after the provider rate limited it."""
+        with self._lock:
+            if key not in self._cooldown_until:
+                return
+            now = time.monotonic()
+            cooldown = self.cooldown if retry_after is None else retry_after
+            self._cooldown_until[key] = now + cooldown
+            self._last_throttled[key] = now
+            self._throttles[key] += 1
+
+    def before_send(self, request: httpx.Request) -> str:
+        key = self.acquire()
+        request.headers[self.header_name] = self.header_format.format(key=key)
+        return key
+
+    def after_send(
+        self,
+        key: str,
+        response: Optional[httpx.Response],
+        error: Optional[BaseException],
+    ) -> None:
+        if response is not None and response.status_code == 429:
+            self.mark_throttled(key, _parse_retry_after(response.headers))
+
+    def stats(self) -> List[Dict]:
+        """Snapshot of per-key usage, keys are masked to their last 4 characters."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "key": f"...{key[-4:]}",
+                    "requests": self._requests[key],
+                    "throttles": self._throttles[key],
+                    "cooling_down": self._cooldown_until[key] > now,
+                }
+                for key in self._keys
+            ]
+
+
+def _parse_retry_after(headers: httpx.Headers) -> Optional[float]:
+    for name in ("retry-after-ms", "retry-after"):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except ValueError:
+            continue
+        return seconds / 1000 if name == "retry-after-ms" else seconds
+    return None
@@ -1,27 +1,172 @@
-import json
-from typing import Any, Dict, List, Optional, Type, TypeVar, Union
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar, Union
 import uuid
 import instructor
 from anthropic import Anthropic
 from openai import OpenAI, AzureOpenAI
 from pydantic import BaseModel, Field
 from ava_mosaic_ai.utils.utils import get_llm_provider
+from ava_mosaic_ai.utils.json_codec import default_codec
 from ava_mosaic_ai.config.settings import LLMProvider, get_settings
 from portkey_ai import PORTKEY_GATEWAY_URL, createHeaders
 from instructor import Instructor
 from anthropic import Anthropic
 
 import httpx
-from collections import OrderedDict
+from httpx._utils import URLPattern
+import contextvars
+import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from ava_mosaic_ai.accounting import (
+    MODEL_HEADER,
+    RESPONSE_MODEL_HEADER,
+    UsageAccountant,
+    extract_usage,
+)
+from ava_mosaic_ai.audit_store import NO_AUDIT_HEADER, AuditStore
+from ava_mosaic_ai.candidates import CandidateStats, run_candidates
+from ava_mosaic_ai.cascade import CascadeStats, CascadeTier, run_cascade
+from ava_mosaic_ai.deadline import (
+    DEADLINE_HEADER,
+    DeadlineCancelled,
+    DeadlineExceededError,
+    check_retry_fits,
+    clamp_request_timeout,
+    deadline_retrying,
+    resolve_deadline,
+)
+from ava_mosaic_ai.embeddings import EmbeddingCache, create_embeddings
+from ava_mosaic_ai.key_pool import APIKeyPool
+from ava_mosaic_ai.load_balancer import EndpointBalancer
+from ava_mosaic_ai.mock_provider import MockLLMTransport
+from ava_mosaic_ai.packing import RequestPacker
+from ava_mosaic_ai.prepared import PreparedCompletion
+from ava_mosaic_ai.scheduler import RequestScheduler
+from ava_mosaic_ai.token_budget import TokenBudgetEstimator
+from ava_mosaic_ai.tracing import (
+    TRACEPARENT_HEADER,
+    HTTPTracingHook,
+    SpanContext,
+    Tracer,
+    current_span,
+    extract_context,
+    parse_traceparent,
+)
+
+# headers starting with this prefix are consumed by CustomHTTPXClient and never
+# forwarded to the provider
+INTERNAL_HEADER_PREFIX = "x-mosaic-"
+ROUTE_HEADER = "x-mosaic-route"
+
+
+class RequestRoute:
+    """
+    Per factory request hooks registered on a CustomHTTPXClient.
+
+    Each hook implements `before_send(request) -> ticket`, which may rewrite the
+    request, and `after_send(ticket, response, error)`, which observes the outcome
+    of that HTTP attempt. With an `accountant`, the usage of every response is
+    recorded under the route's `labels`.
+    """
+
+    def __init__(
+        self,
+        hooks: Optional[List[Any]] = None,
+        accountant: Optional[UsageAccountant] = None,
+        labels: Optional[Dict[str, str]] = None,
+    ):
+        self.hooks = list(hooks or [])
+        self.accountant = accountant
+        self.labels = dict(labels or {})
+
+
+# validation span of the create_completion call running in the current context
+_validation_span: contextvars.ContextVar = contextvars.ContextVar(
+    "ava_mosaic_validation_span", default=None
+)
 
 
 class CustomHTTPXClient(httpx.Client):
-    def __init__(self, *args, max_cache_size=1000, cache_ttl=3600, **kwargs):
+    def __init__(
+        self,
+        *args,
+        max_cache_size=1000,
+        cache_ttl=3600,
+        json_codec=None,
+        audit_compression=None,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
-        self.response_cache = OrderedDict()
+        self.json_codec = json_codec or default_codec
         self.max_cache_size = max_cache_size
         self.cache_ttl = cache_ttl
+        # compact audit records, see ava_mosaic_ai.audit_store.AuditStore
+        self.response_cache = AuditStore(
+            max_size=max_cache_size,
+            ttl=cache_ttl,
+            compression=audit_compression,
+            json_codec=self.json_codec,
+        )
+        self._routes = weakref.WeakValueDictionary()
+
+    def mount(self, url: str, transport: httpx.BaseTransport) -> None:
+        """Route requests to `url` and below through `transport`, like the `mounts` argument."""
+        self._mounts[URLPattern(url)] = transport
+        # httpx expects the most specific patterns first
+        self._mounts = dict(sorted(self._mounts.items()))
+
+    def register_route(self, route: RequestRoute) -> str:
+        """Register a route, requests carrying the returned id in ROUTE_HEADER run its hooks."""
+        route_id = uuid.uuid4().hex
+        self._routes[route_id] = route
+        return route_id
+
+    def warm_up(
+        self, urls: List[str], connections: int = 1, timeout: float = 5.0
+    ) -> Dict[str, int]:
+        """
+        Open `connections` keepalive connections to each url, paying DNS, TCP and TLS
+        setup before the first real request. Returns the number of connections
+        established per url.
+
+        Every probe holds its response open until all probes got one, so the pool
+        has to open distinct connections instead of reusing a single one. Probes
+        bypass the trace id check and the audit cache.
+        """
+        targets = [url for url in urls for _ in range(connections)]
+        if not targets:
+            return {}
+        barrier = threading.Barrier(len(targets))
+
+        def probe(url: str) -> bool:
+            response = None
+            try:
+                request = self.build_request("HEAD", url, timeout=timeout)
+                response = httpx.Client.send(self, request, stream=True)
+                return True
+            except httpx.HTTPError:
+                return False
+            finally:
+                try:
+                    barrier.wait(timeout)
+                except threading.BrokenBarrierError:
+                    pass
+                if response is not None:
+                    try:
+                        # reading to the end returns the connection to the pool
+                        response.read()
+                    except httpx.HTTPError:
+                        pass
+                    response.close()
+
+        with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+            results = list(pool.map(probe, targets))
+        established = {url: 0 for url in urls}
+        for url, ok in zip(targets, results):
+            established[url] += ok
+        return established
 
     def send(self, request: httpx.Request, *args, **kwargs):
         if "x-trace-id" not in request.headers:
@@ -29,68 +174,122 @@ class CustomHTTPXClient(httpx.Client):
 
         trace_id = request.headers["x-trace-id"]
 
+        route = self._routes.get(request.headers.get(ROUTE_HEADER, ""))
+        deadline = request.headers.get(DEADLINE_HEADER)
+        if deadline is not None:
+            deadline = float(deadline)
+            clamp_request_timeout(request, deadline)
+        accounting_labels = None
+        if route is not None and route.accountant is not None:
+            accounting_labels = dict(route.labels)
+            for label, header in (
+                ("model", MODEL_HEADER),
+                ("response_model", RESPONSE_MODEL_HEADER),
+            ):
+                if header in request.headers:
+                    accounting_labels[label] = request.headers[header]
+        audited = NO_AUDIT_HEADER not in request.headers
+        for name in [k for k in request.headers if k.startswith(INTERNAL_HEADER_PREFIX)]:
+            del request.headers[name]
+        tickets = [(hook, hook.before_send(request)) for hook in route.hooks] if route else []
+
+        # bodies are only captured for sampled traces, requests without trace context are always captured
+        span_context = parse_traceparent(request.headers.get(TRACEPARENT_HEADER))
+        sampled = audited and (span_context is None or span_context.sampled)
+
         # Capture request data
-        request_data = {
-            "method": request.method,
-            "url": str(request.url),
-            "headers": dict(request.headers),
-            "content": self._parse_json(request.content.decode())
-            if request.content
-            else None,
-        }
+        request_content = None
+        if sampled and request.content:
+            request_content = self._parse_json(request.content)
 
-        response = super().send(request, *args, **kwargs)
+        try:
+            response = super().send(request, *args, **kwargs)
+        except Exception as exc:
+            for hook, ticket in tickets:
+                hook.after_send(ticket, None, exc)
+            if (
+                deadline is not None
+                and isinstance(exc, httpx.TimeoutException)
+                and time.monotonic() >= deadline
+            ):
+                raise DeadlineCancelled(f"deadline exceeded: {exc}") from exc
+            raise
+        for hook, ticket in tickets:
+            hook.after_send(ticket, response, None)
+        if deadline is not None:
+            try:
+                # the SDK's own retry loop sleeps on retry-after, past the deadline
+                check_retry_fits(response, deadline)
+            except DeadlineCancelled:
+                response.close()
+                raise
 
         # make sure to add x-trace-id to the response header if it is not present
         if "x-trace-id" not in response.headers:
             response.headers["x-trace-id"] = trace_id
 
-        # Capture response data
-        response_data = {
-            "status_code": response.status_code,
-            "headers": dict(response.headers),
-            "content": self._parse_json(response.text),
-        }
-
-        self._add_to_cache(trace_id, request_data, response_data)
+        if accounting_labels is not None:
+            usage = extract_usage(self._parse_json(response.content))
+            if usage is not None:
+                route.accountant.record(accounting_labels, usage)
+
+        if audited:
+            # the audit record keeps the raw response body, it is parsed when read
+            self.response_cache.add(
+                trace_id,
+                request.method,
+                str(request.url),
+                response.status_code,
+                request_headers=request.headers if sampled else None,
+                response_headers=response.headers if sampled else None,
+                request_content=request_content,
+                response_content=response.content if sampled else None,
+            )
 
         return response
 
-    def _add_to_cache(self, trace_id, request_data, response_data):
-        if len(self.response_cache) >= self.max_cache_size:
-            self.response_cache.popitem(last=False)
-
-        self.response_cache[trace_id] = {
-            "request": request_data,
-            "response": response_data,
-            "timestamp": time.time(),
-        }
-
-    def _parse_json(self, content: str) -> Union[Dict, List, str]:
+    def _parse_json(self, content: Union[str, bytes]) -> Union[Dict, List, str]:
         """
         Attempt to parse the content as JSON. If parsing fails, return the original string.
         """
         try:
-            return json.loads(content)
-        except json.JSONDecodeError:
+            return self.json_codec.loads(content)
+        except self.json_codec.decode_errors:
+            if isinstance(content, bytes):
+                return content.decode(errors="replace")
             return content
 
     def get_request_response_data(self, trace_id):
-        if trace_id in self.response_cache:
-            cache_entry = self.response_cache[trace_id]
-            if time.time() - cache_entry["timestamp"] <= self.cache_ttl:
-                return cache_entry["request"], cache_entry["response"]
-            else:
-                del self.response_cache[trace_id]
-        return None, None
+        return self.response_cache.get(trace_id)
 
     def clear_expired_cache(self):
-        current_time = time.time()
-        self.response_cache = OrderedDict(
-            (k, v)
-            for k, v in self.response_cache.items()
-            if current_time - v["timestamp"] <= self.cache_ttl
-        )
+        self.response_cache.clear_expired()
+
+
+# header used to carry the credential that an APIKeyPool rotates, per provider
+KEY_POOL_HEADERS = {
+    LLMProvider.OPENAI: ("authorization", "Bearer {key}"),
+    LLMProvider.ANTHROPIC: ("x-api-key", "{key}"),
+    LLMProvider.PORTKEY_AZURE_OPENAI: ("x-portkey-virtual-key", "{key}"),
+    LLMProvider.PORTKEY_ANTHROPIC: ("x-portkey-virtual-key", "{key}"),
+}
+
+
+def _keep_warm(
+    factory_ref, stop: threading.Event, probe_interval: Optional[float]
+) -> None:
+    """Warm up a factory, then keep its connections alive with periodic probes."""
+    factory = factory_ref()
+    if factory is None:
+        return
+    factory.warm_up()
+    del factory
+    while probe_interval and not stop.wait(probe_interval):
+        factory = factory_ref()
+        if factory is None:
+            return
+        factory.warm_up()
+        del factory
 
 
 class LLMFactory:
@@ -99,33 +298,189 @@ class LLMFactory:
         provider: Union[LLMProvider, str],
         metadata: Optional[dict] = None,
         http_client: Any = None,
+        tracer: Optional[Tracer] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        accountant: Optional[UsageAccountant] = None,
     ) -> None:
         if isinstance(provider, str):
             provider = get_llm_provider(provider)
-        self.http_client = http_client
-        if self.http_client is None:
-            print("No http_client provided, Creating new http client")
-            self.http_client = CustomHTTPXClient(max_cache_size=1000, cache_ttl=3600)
-
         self.metadata = metadata
         self.provider = provider
+        self.scheduler = scheduler
+        self.accountant = accountant
         self.settings = get_settings().get_provider_settings(provider)
+
+        self.http_client = http_client
+        if self.http_client is None:
+            print("No http_client provided, Creating new http client")
+            # room in the pool for every warmed connection of every endpoint
+            warm_connections = self.settings.warmup_connections * max(
+                1, len(getattr(self.settings, "endpoints", None) or [])
+            )
+            self.http_client = CustomHTTPXClient(
+                max_cache_size=1000,
+                cache_ttl=3600,
+                audit_compression=self.settings.audit_compression,
+                limits=httpx.Limits(
+                    max_connections=max(100, warm_connections),
+                    max_keepalive_connections=max(20, warm_connections),
+                    keepalive_expiry=self.settings.keepalive_expiry,
+                ),
+            )
+        if provider == LLMProvider.MOCK and hasattr(self.http_client, "mount"):
+            origin = httpx.URL(self.settings.base_url).copy_with(path="/")
+            self.http_client.mount(str(origin), MockLLMTransport(self.settings))
         self._api_key = self.settings.api_key
+        self.tracer = tracer or Tracer(sample_rate=self.settings.trace_sample_rate)
+        self.key_pool = self._initialize_key_pool()
+        self.load_balancer = self._initialize_load_balancer()
+        hooks = [HTTPTracingHook(self.tracer), self.key_pool, self.load_balancer]
+        self._labels = (
+            accountant.labels(provider.value, metadata) if accountant is not None else {}
+        )
+        self._route = RequestRoute(
+            hooks=[h for h in hooks if h is not None],
+            accountant=accountant,
+            labels=self._labels,
+        )
+        self._default_headers = {}
+        if hasattr(self.http_client, "register_route"):
+            self._default_headers[ROUTE_HEADER] = self.http_client.register_route(
+                self._route
+            )
+        self._timeout = httpx.Timeout(
+            self.settings.read_timeout, connect=self.settings.connect_timeout
+        )
         self.client = self._initialize_client()
+        self.embedding_cache = None
+        self.cascade_stats = CascadeStats()
+        self.candidate_stats = CandidateStats()
+        self.token_budget = TokenBudgetEstimator()
+        self._cascade_factories: Dict[LLMProvider, "LLMFactory"] = {}
+
+        self.ready = threading.Event()
+        self.warmup_report: Dict[str, int] = {}
+        self._stop = threading.Event()
+        # clients without warm_up, e.g. a plain httpx.Client, start cold
+        if self.settings.warmup_connections > 0 and hasattr(self.http_client, "warm_up"):
+            threading.Thread(
+                target=_keep_warm,
+                args=(
+                    weakref.ref(self),
+                    self._stop,
+                    self.settings.warmup_probe_interval,
+                ),
+                daemon=True,
+            ).start()
+        else:
+            self.ready.set()
+
+    def warm_up(self, connections: Optional[int] = None) -> Dict[str, int]:
+        """
+        Open keepalive connections to every endpoint of this factory, then mark it
+        ready. The factory is marked ready even when the warm-up fails, the report
+        then counts 0 connections for every endpoint.
+        """
+        if connections is None:
+            connections = max(1, self.settings.warmup_connections)
+        if self.load_balancer is not None:
+            urls = [str(endpoint.url) for endpoint in self.load_balancer.endpoints]
+        else:
+            urls = [str(self.client.client.base_url)]
+        try:
+            if hasattr(self.http_client, "warm_up"):
+                self.warmup_report = self.http_client.warm_up(urls, connections)
+        except Exception as exc:
+            print(f"Connection warm-up failed: {type(exc).__name__}: {exc}")
+            self.warmup_report = {url: 0 for url in urls}
+        finally:
+            self.ready.set()
+        return self.warmup_report
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the startup warm-up finished, returns False on timeout."""
+        return self.ready.wait(timeout)
+
+    def close(self) -> None:
+        """Stop background keepalive probes and health checks."""
+        self._stop.set()
+        if self.load_balancer is not None:
+            self.load_balancer.close()
+
+    def _initialize_key_pool(self) -> Optional[APIKeyPool]:
+        if self.provider not in KEY_POOL_HEADERS:
+            return None
+        header_name, header_format = KEY_POOL_HEADERS[self.provider]
+        if self.provider in (
+            LLMProvider.PORTKEY_AZURE_OPENAI,
+            LLMProvider.PORTKEY_ANTHROPIC,
+        ):
+            keys = self.settings.virtual_api_keys or [self.settings.virtual_api_key]
+        else:
+            keys = self.settings.api_keys or [self._api_key]
+        return APIKeyPool(
+            keys,
+            header_name=header_name,
+            header_format=header_format,
+            strategy=self.settings.key_selection,
+            cooldown=self.settings.key_cooldown,
+        )
+
+    def _initialize_load_balancer(self) -> Optional[EndpointBalancer]:
+        if self.provider == LLMProvider.LLAMA:
+            primary_url, deployment = self.settings.base_url, None
+        elif self.provider == LLMProvider.AZURE_OPENAI:
+            primary_url = self.settings.azure_endpoint
+            deployment = self.settings.default_model
+        else:
+            return None
+        if not self.settings.endpoints:
+            return None
+        return EndpointBalancer(
+            primary_url,
+            self.settings.endpoints,
+            strategy=self.settings.load_balancing,
+            consecutive_failures=self.settings.outlier_consecutive_failures,
+            ejection_time=self.settings.outlier_ejection_time,
+            health_check_interval=self.settings.health_check_interval,
+            health_check_path=self.settings.health_check_path,
+            deployment=deployment,
+        )
 
     def _initialize_client(self) -> Instructor:
         client_initializers = {
             LLMProvider.OPENAI: lambda: instructor.from_openai(
-                OpenAI(http_client=self.http_client, api_key=self._api_key)
+                OpenAI(
+                    http_client=self.http_client,
+                    api_key=self._api_key,
+                    default_headers=self._default_headers,
+                    timeout=self._timeout,
+                )
             ),
             LLMProvider.ANTHROPIC: lambda: instructor.from_anthropic(
-                Anthropic(http_client=self.http_client, api_key=self._api_key)
+                Anthropic(
+                    http_client=self.http_client,
+                    api_key=self._api_key,
+                    default_headers=self._default_headers,
+                    timeout=self._timeout,
+                )
+            ),
+            LLMProvider.MOCK: lambda: instructor.from_openai(
+                OpenAI(
+                    http_client=self.http_client,
+                    base_url=self.settings.base_url,
+                    api_key=self._api_key,
+                    default_headers=self._default_headers,
+                    timeout=self._timeout,
+                )
             ),
             LLMProvider.LLAMA: lambda: instructor.from_openai(
                 OpenAI(
                     http_client=self.http_client,
                     base_url=self.settings.base_url,
                     api_key=self._api_key,
+                    default_headers=self._default_headers,
+                    timeout=self._timeout,
                 ),
                 mode=instructor.Mode.JSON,
             ),
@@ -135,6 +490,8 @@ class LLMFactory:
                     api_key=self._api_key,
                     azure_endpoint=self.settings.azure_endpoint,
                     api_version=self.settings.api_version,
+                    default_headers=self._default_headers,
+                    timeout=self._timeout,
                 )
             ),
             LLMProvider.PORTKEY_AZURE_OPENAI: lambda: instructor.from_openai(
@@ -142,12 +499,14 @@ class LLMFactory:
                     http_client=self.http_client,
                     api_key=self.settings.virtual_api_key,
                     base_url=PORTKEY_GATEWAY_URL,
+                    timeout=self._timeout,
                     default_headers=createHeaders(
                         provider="openai",
                         virtual_key=self.settings.virtual_api_key,
                         api_key=self._api_key,
                         metadata=self.metadata,
-                    ),
+                    )
+                    | self._default_headers,
                 )
             ),
             LLMProvider.PORTKEY_ANTHROPIC: lambda: instructor.from_anthropic(
@@ -155,12 +514,14 @@ class LLMFactory:
                     http_client=self.http_client,
                     api_key=self.settings.virtual_api_key,
                     base_url=PORTKEY_GATEWAY_URL,
+                    timeout=self._timeout,
                     default_headers=createHeaders(
                         provider="anthropic",
                         virtual_key=self.settings.virtual_api_key,
                         api_key=self._api_key,
                         metadata=self.metadata,
-                    ),
+                    )
+                    | self._default_headers,
                 )
                 # .with_options(self.metadata)
             ),
@@ -169,9 +530,35 @@ class LLMFactory:
         initializer = client_initializers.get(self.provider)
 
         if initializer:
-            return initializer()
+            client = initializer()
+            if hasattr(client, "on"):
+                client.on("completion:response", self._on_completion_response)
+                client.on("parse:error", self._on_parse_error)
+            return client
         raise ValueError(f"Unsupported LLM provider: {self.provider}")
 
+    def _on_completion_response(self, *args, **kwargs) -> None:
+        # instructor parses the response next, time it as a validation span
+        span = current_span.get()
+        if span is None:
+            return
+        self._end_validation_span()
+        _validation_span.set(
+            self.tracer.start_span("llm.validation", parent=span.context)
+        )
+
+    def _on_parse_error(self, error: Exception, *args, **kwargs) -> None:
+        self._end_validation_span(error)
+
+    def _end_validation_span(self, error: Optional[BaseException] = None) -> None:
+        span = _validation_span.get()
+        if span is None:
+            return
+        if error is not None:
+            span.record_exception(error)
+        span.end()
+        _validation_span.set(None)
+
     @property
     def api_key(self):
         return self._api_key
@@ -179,7 +566,14 @@ class LLMFactory:
     @api_key.setter
     def api_key(self, value):
         self._api_key = value
-        self.client = self._initialize_client()
+        if self.key_pool is not None and self.provider in (
+            LLMProvider.OPENAI,
+            LLMProvider.ANTHROPIC,
+        ):
+            # the pool rewrites the credential per request, no need to rebuild the client
+            self.key_pool.set_keys([value])
+        else:
+            self.client = self._initialize_client()
 
     T = TypeVar("T", bound=BaseModel)
 
@@ -187,9 +581,47 @@ class LLMFactory:
         self,
         response_model: Type[T],
         messages: List[Dict[str, str]],
-        extra_headers: Dict[str, str] = {},
+        extra_headers: Optional[Dict[str, str]] = None,
+        trace_context: Union[None, str, SpanContext, Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        priority: Optional[str] = None,
+        candidates: Optional[int] = None,
+        select: Optional[Callable[[List[T]], T]] = None,
         **kwargs,
     ) -> T:
+        """
+        Create a completion validated against `response_model`.
+
+        `timeout` (seconds) and `deadline` (a `time.monotonic()` value) bound the whole
+        call, including instructor retries: each HTTP attempt's connect and read
+        timeouts are capped by the budget left, a retry is skipped when the budget
+        cannot fit another attempt, and DeadlineExceededError is raised once it passes.
+
+        With a scheduler, the call first waits for a slot of its `priority` class;
+        that wait is reported as "queue_time" in the audit data, apart from
+        "request_time".
+
+        With `candidates` > 1, several candidates are generated at once instead of
+        re-asking after a validation failure, see `run_candidates`; the first valid
+        one is returned, or `select(valid_candidates)`, e.g. `candidates.vote`.
+        """
+        deadline = resolve_deadline(timeout, deadline)
+        if candidates is not None and candidates > 1:
+            return run_candidates(
+                self,
+                response_model,
+                messages,
+                candidates,
+                select=select,
+                extra_headers=extra_headers,
+                trace_context=trace_context,
+                deadline=deadline,
+                priority=priority,
+                **kwargs,
+            )
+        # copy, so concurrent calls never share a trace id through a shared dict
+        extra_headers = dict(extra_headers or {})
         trace_id = extra_headers.get("x-trace-id")
         if trace_id is None:
             trace_id = str(uuid.uuid4())
@@ -199,19 +631,93 @@ class LLMFactory:
         if extra_headers.get("x-portkey-trace-id") is None:
             extra_headers["x-portkey-trace-id"] = trace_id
 
+        # continue the caller's trace, from trace_context or a traceparent in extra_headers
+        parent = extract_context(trace_context) or parse_traceparent(
+            extra_headers.get(TRACEPARENT_HEADER)
+        )
+
         completion_params = {
             "model": kwargs.get("model", self.settings.default_model),
             "temperature": kwargs.get("temperature", self.settings.temperature),
             "max_retries": kwargs.get("max_retries", self.settings.max_retries),
-            "max_tokens": kwargs.get("max_tokens", self.settings.max_tokens),
+            "max_tokens": kwargs.get("max_tokens"),
             "response_model": response_model,
             "messages": messages,
             "extra_headers": extra_headers,
         }
+        if "n" in kwargs:
+            completion_params["n"] = kwargs["n"]
+        if completion_params["max_tokens"] is None:
+            completion_params["max_tokens"] = (
+                self.token_budget.budget(
+                    completion_params["model"],
+                    response_model,
+                    default=self.settings.max_tokens,
+                )
+                if self.settings.auto_max_tokens
+                else self.settings.max_tokens
+            )
+
+        if self.accountant is not None:
+            extra_headers[MODEL_HEADER] = completion_params["model"]
+            extra_headers[RESPONSE_MODEL_HEADER] = response_model.__name__
+
+        if deadline is not None:
+            extra_headers[DEADLINE_HEADER] = repr(deadline)
+            completion_params["max_retries"] = deadline_retrying(
+                completion_params["max_retries"], deadline
+            )
+
+        span = self.tracer.start_span(
+            "llm.completion",
+            parent=parent,
+            attributes={
+                "llm.provider": self.provider.value,
+                "llm.model": completion_params["model"],
+                "llm.response_model": response_model.__name__,
+                "llm.trace_id": trace_id,
+            },
+        )
+        extra_headers[TRACEPARENT_HEADER] = span.traceparent
 
-        start_time = time.time()
-        response = self.client.chat.completions.create(**completion_params)
+        ticket = None
+        token = current_span.set(span)
+        validation_token = _validation_span.set(None)
+        try:
+            if self.accountant is not None:
+                self.accountant.check(
+                    {
+                        **self._labels,
+                        "model": completion_params["model"],
+                        "response_model": response_model.__name__,
+                    }
+                )
+            if self.scheduler is not None:
+                ticket = self.scheduler.acquire(priority, deadline=deadline)
+                span.set_attribute("llm.queue_time", ticket.queue_time)
+            start_time = time.time()
+            response = self.client.chat.completions.create(**completion_params)
+        except DeadlineCancelled as exc:
+            self._end_validation_span(exc)
+            span.record_exception(exc)
+            raise DeadlineExceededError(
+                f"create_completion exceeded its deadline, trace_id: {trace_id}"
+            ) from exc
+        except Exception as exc:
+            self._end_validation_span(exc)
+            span.record_exception(exc)
+            # truncated outputs raise, their usage still sizes the next budget
+            self._observe_usage(completion_params, getattr(exc, "last_completion", None))
+            raise
+        finally:
+            if ticket is not None:
+                self.scheduler.release(ticket)
+            self._end_validation_span()
+            _validation_span.reset(validation_token)
+            current_span.reset(token)
+            span.end()
         end_time = time.time()
+        self._observe_usage(completion_params, getattr(response, "_raw_response", None))
 
         request_time = end_time - start_time
 
@@ -224,18 +730,172 @@ class LLMFactory:
         if hasattr(response, "__dict__"):
             response.__dict__["_audit_data"] = {
                 "trace_id": trace_id,
+                "traceparent": span.traceparent,
                 "request_time": request_time,
+                "queue_time": ticket.queue_time if ticket is not None else 0.0,
+                "priority": ticket.priority if ticket is not None else None,
+                "max_tokens": completion_params["max_tokens"],
                 "http_request": request_data,
                 "http_response": response_data,
             }
 
         return response
 
+    def _observe_usage(self, completion_params: Dict[str, Any], completion: Any) -> None:
+        if completion is not None and self.settings.auto_max_tokens:
+            self.token_budget.observe(
+                completion_params["model"],
+                completion_params["response_model"],
+                completion,
+                max_tokens=completion_params["max_tokens"],
+            )
+
+    def prepare_completion(
+        self,
+        response_model: Type[T],
+        messages: List[Dict[str, str]],
+        extra_headers: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> PreparedCompletion:
+        """
+        Prepare a create_completion call for fixed-shape, high-volume use.
+
+        `messages` contents are `str.format` templates filled in by calling the
+        result, e.g. `extract = llm.prepare_completion(User, messages)` and then
+        `extract(text=...)`. `kwargs` are create_completion arguments fixed for
+        every call.
+        """
+        return PreparedCompletion(
+            self, response_model, messages, extra_headers=extra_headers, **kwargs
+        )
+
+    def create_packer(
+        self,
+        response_model: Type[T],
+        instructions: str,
+        max_batch_size: int = 16,
+        max_wait: float = 0.05,
+        **kwargs,
+    ) -> RequestPacker:
+        """
+        Pack many small extractions for `response_model` into shared requests.
+
+        `instructions` is the system prompt, each input submitted to the packer
+        becomes one numbered item of a batched request, see `RequestPacker`. Use it
+        as a context manager, or call `close()`, to send the last partial batch.
+        """
+        return RequestPacker(
+            self,
+            response_model,
+            instructions,
+            max_batch_size=max_batch_size,
+            max_wait=max_wait,
+            **kwargs,
+        )
+
+    def create_cascade_completion(
+        self,
+        response_model: Type[T],
+        messages: List[Dict[str, str]],
+        tiers: List[Union[CascadeTier, Dict[str, Any]]],
+        accept: Optional[Callable[[T], bool]] = None,
+        **kwargs,
+    ) -> T:
+        """
+        Create a completion with an ordered cascade of models, cheapest first.
+
+        Each tier gets `attempts` tries before escalating to the next tier; `accept`
+        (or a `cascade_accept` method on the response model) can also reject a valid
+        result as not confident enough. Per tier outcomes and latency are added to
+        the audit data under "cascade" and aggregated in `cascade_stats`.
+        """
+        tiers = [
+            tier if isinstance(tier, CascadeTier) else CascadeTier(**tier)
+            for tier in tiers
+        ]
+        return run_cascade(self, response_model, messages, tiers, accept=accept, **kwargs)
+
+    def _get_cascade_factory(self, provider: Optional[str]) -> "LLMFactory":
+        if provider is None:
+            return self
+        provider = get_llm_provider(provider) if isinstance(provider, str) else provider
+        if provider == self.provider:
+            return self
+        if provider not in self._cascade_factories:
+            self._cascade_factories[provider] = LLMFactory(
+                provider,
+                metadata=self.metadata,
+                http_client=self.http_client,
+                tracer=self.tracer,
+                scheduler=self.scheduler,
+                accountant=self.accountant,
+            )
+        return self._cascade_factories[provider]
+
+    # providers returning several choices for the `n` parameter
+    CANDIDATE_N_PROVIDERS = (
+        LLMProvider.OPENAI,
+        LLMProvider.AZURE_OPENAI,
+        LLMProvider.PORTKEY_AZURE_OPENAI,
+        LLMProvider.MOCK,
+    )
+
+    EMBEDDING_PROVIDERS = (
+        LLMProvider.OPENAI,
+        LLMProvider.AZURE_OPENAI,
+        LLMProvider.LLAMA,
+        LLMProvider.PORTKEY_AZURE_OPENAI,
+    )
+
+    def create_embeddings(
+        self,
+        texts: List[str],
+        model: Optional[str] = None,
+        cache: Union[bool, EmbeddingCache] = False,
+        **kwargs,
+    ):
+        """
+        Embed `texts` and return a contiguous float32 numpy matrix, one row per text.
+
+        Inputs are chunked by `settings.embedding_batch_size` and the batches are sent
+        with up to `settings.embedding_concurrency` requests in flight. Pass `cache=True`
+        to reuse the factory's EmbeddingCache, or an EmbeddingCache to share one.
+        """
+        if self.provider not in self.EMBEDDING_PROVIDERS:
+            raise ValueError(f"Embeddings are not supported by provider: {self.provider}")
+        model = model or self.settings.embedding_model
+        if model is None:
+            raise ValueError(f"No embedding model configured for provider: {self.provider}")
+        if cache is True:
+            if self.embedding_cache is None:
+                self.embedding_cache = EmbeddingCache()
+            cache = self.embedding_cache
+
+        return create_embeddings(
+            self.client.client,
+            texts,
+            model=model,
+            batch_size=kwargs.pop("batch_size", self.settings.embedding_batch_size),
+            max_concurrency=kwargs.pop(
+                "max_concurrency", self.settings.embedding_concurrency
+            ),
+            cache=cache if isinstance(cache, EmbeddingCache) else None,
+            **kwargs,
+        )
+
     @staticmethod
     def get_audit_data(response: BaseModel) -> Optional[Dict]:
         """Retrieve the audit_data from a response object."""
         return getattr(response, "_audit_data", None)
 
+    @staticmethod
+    def dump_audit_data(response: BaseModel, indent: bool = True) -> Optional[str]:
+        """Serialize the audit_data of a response object to a JSON string."""
+        audit_data = getattr(response, "_audit_data", None)
+        if audit_data is None:
+            return None
+        return default_codec.dumps(audit_data, indent=indent)
+
     @staticmethod
     def get_trace_id(response: BaseModel) -> Optional[str]:
         """Retrieve the trace_id from a response object."""
@@ -0,0 +1,193 @@
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional
+
+import httpx
+
+from ava_mosaic_ai.config.settings import EndpointSettings
+
+# a rejected key is a misconfigured endpoint, other endpoints may still accept theirs
+CREDENTIAL_ERROR_STATUS_CODES = (401, 403)
+
+
+class EndpointState:
+    def __init__(self, settings: EndpointSettings):
+        self.settings = settings
+        self.url = httpx.URL(settings.url.rstrip("/"))
+        self.current_weight = 0.0
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class EndpointBalancer:
+    """
+    Spreads requests of one provider over several endpoints.
+
+    Installed as a request hook on `CustomHTTPXClient`: requests the SDK built
+    for `primary_url` are rewritten to the selected endpoint. Endpoints are
+    ejected for a while after consecutive connection errors, 5xx responses or
+    rejected credentials (passive outlier detection) and, when `health_check_interval` is set, a
+    background thread probes them and brings recovered endpoints back early.
+    """
+
+    STRATEGIES = ("weighted_round_robin", "least_outstanding")
+
+    def __init__(
+        self,
+        primary_url: str,
+        endpoints: List[EndpointSettings],
+        strategy: str = "weighted_round_robin",
+        consecutive_failures: int = 5,
+        ejection_time: float = 30.0,
+        health_check_interval: Optional[float] = None,
+        health_check_path: str = "",
+        deployment: Optional[str] = None,
+    ):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(
+                f"Unsupported load balancing strategy: {strategy}, "
+                f"expected one of {self.STRATEGIES}"
+            )
+        if not endpoints:
+            raise ValueError("EndpointBalancer requires at least one endpoint")
+        self.primary_url = primary_url.rstrip("/")
+        self.strategy = strategy
+        self.consecutive_failures = consecutive_failures
+        self.ejection_time = ejection_time
+        self.health_check_path = health_check_path
+        self.deployment = deployment
+        self.endpoints = [EndpointState(endpoint) for endpoint in endpoints]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread = None
+        if health_check_interval:
+            self._health_thread = threading.Thread(
+                target=_health_check_loop,
+                args=(weakref.ref(self), self._stop, health_check_interval),
+                daemon=True,
+            )
+            self._health_thread.start()
+
+    def select(self) -> EndpointState:
+        with self._lock:
+            now = time.monotonic()
+            available = [e for e in self.endpoints if e.is_available(now)]
+            if not available:
+                # never eject everything, fall back to the endpoint that recovers first
+                available = [min(self.endpoints, key=lambda e: e.ejected_until)]
+            if self.strategy == "least_outstanding":
+                endpoint = min(
+                    available, key=lambda e: (e.outstanding + 1) / e.settings.weight
+                )
+            else:
+                # smooth weighted round robin, as in nginx
+                total = 0.0
+                for e in available:
+                    e.current_weight += e.settings.weight
+                    total += e.settings.weight
+                endpoint = max(available, key=lambda e: e.current_weight)
+                endpoint.current_weight -= total
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def before_send(self, request: httpx.Request) -> Optional[EndpointState]:
+        url = str(request.url)
+        if not url.startswith(self.primary_url):
+            return None
+        endpoint = self.select()
+        path = url[len(self.primary_url):]
+        deployment = endpoint.settings.deployment
+        if deployment and self.deployment:
+            path = path.replace(
+                f"/deployments/{self.deployment}/", f"/deployments/{deployment}/", 1
+            )
+        request.url = httpx.URL(str(endpoint.url) + path)
+        request.headers["host"] = request.url.netloc.decode("ascii")
+        request.headers.update(endpoint.settings.headers)
+        return endpoint
+
+    def after_send(
+        self,
+        endpoint: Optional[EndpointState],
+        response: Optional[httpx.Response],
+        error: Optional[BaseException],
+    ) -> None:
+        if endpoint is None:
+            return
+        failed = isinstance(error, httpx.TransportError) or (
+            response is not None
+            and (
+                response.status_code >= 500
+                or response.status_code in CREDENTIAL_ERROR_STATUS_CODES
+            )
+        )
+        with self._lock:
+            endpoint.outstanding -= 1
+            self._record(endpoint, failed)
+
+    def _record(self, endpoint: EndpointState, failed: bool) -> None:
+        if not failed:
+            endpoint.consecutive_failures = 0
+            return
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.consecutive_failures:
+            endpoint.ejections += 1
+            # back off longer for endpoints that keep failing
+            endpoint.ejected_until = time.monotonic() + self.ejection_time * min(
+                endpoint.ejections, 10
+            )
+            endpoint.consecutive_failures = 0
+
+    def check_health(self, client: httpx.Client) -> None:
+        """Probe every endpoint once, ejecting dead ones and restoring healthy ones."""
+        for endpoint in self.endpoints:
+            try:
+                response = client.get(str(endpoint.url) + self.health_check_path)
+                healthy = response.status_code < 500
+            except httpx.HTTPError:
+                healthy = False
+            with self._lock:
+                if healthy:
+                    endpoint.consecutive_failures = 0
+                    endpoint.ejected_until = 0.0
+                else:
+                    endpoint.consecutive_failures = self.consecutive_failures - 1
+                    self._record(endpoint, True)
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "url": str(e.url),
+                    "weight": e.settings.weight,
+                    "outstanding": e.outstanding,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "ejected": not e.is_available(now),
+                }
+                for e in self.endpoints
+            ]
+
+
+def _health_check_loop(balancer_ref, stop: threading.Event, interval: float) -> None:
+    with httpx.Client(timeout=5.0) as client:
+        while not stop.wait(interval):
+            balancer = balancer_ref()
+            if balancer is None:
+                return
+            balancer.check_health(client)
+            del balancer
@@ -0,0 +1,232 @@
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import httpx
+
+# words for unconstrained strings, picked at random so repeated fields differ
+_WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+_FORMATS = {
+    "date": "2024-01-01",
+    "time": "12:00:00",
+    "date-time": "2024-01-01T12:00:00Z",
+    "email": "mock@example.com",
+    "uri": "https://example.com/mock",
+    "uuid": "00000000-0000-4000-8000-000000000000",
+}
+MAX_DEPTH = 6
+
+
+def _bounds(schema: Dict[str, Any], step: float):
+    low = schema.get("minimum")
+    if low is None and "exclusiveMinimum" in schema:
+        low = schema["exclusiveMinimum"] + step
+    high = schema.get("maximum")
+    if high is None and "exclusiveMaximum" in schema:
+        high = schema["exclusiveMaximum"] - step
+    if low is None:
+        low = 0 if high is None or high >= 0 else high - 100
+    if high is None:
+        high = low + 100
+    return low, high
+
+
+def synthesize(
+    schema: Dict[str, Any],
+    rng: random.Random,
+    defs: Optional[Dict[str, Any]] = None,
+    depth: int = 0,
+) -> Any:
+    """Generate a JSON value valid against `schema`, as produced by pydantic's model_json_schema."""
+    defs = schema.get("$defs", {}) if defs is None else defs
+    # past MAX_DEPTH only required content is generated, so recursive models end
+    shallow = depth > MAX_DEPTH
+    if "$ref" in schema:
+        return synthesize(defs[schema["$ref"].split("/")[-1]], rng, defs, depth + 1)
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            options = [o for o in schema[key] if o.get("type") != "null"]
+            if not options or (shallow and len(options) < len(schema[key])):
+                return None
+            return synthesize(rng.choice(options), rng, defs, depth + 1)
+    if "allOf" in schema:
+        value: Dict[str, Any] = {}
+        for part in schema["allOf"]:
+            value.update(synthesize(part, rng, defs, depth + 1))
+        return value
+
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "string":
+        if schema.get("format") in _FORMATS:
+            return _FORMATS[schema["format"]]
+        text = " ".join(rng.choice(_WORDS) for _ in range(3))
+        while len(text) < schema.get("minLength", 0):
+            text += " " + rng.choice(_WORDS)
+        return text[: schema.get("maxLength", len(text))]
+    if kind == "integer":
+        low, high = _bounds(schema, 1)
+        low, high = math.ceil(low), math.floor(high)
+        multiple = schema.get("multipleOf")
+        if multiple:
+            return math.ceil(low / multiple) * multiple
+        return rng.randint(low, high)
+    if kind == "number":
+        low, high = _bounds(schema, 0.01)
+        return round(rng.uniform(low, high), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "array":
+        low = schema.get("minItems", 0)
+        high = min(schema.get("maxItems", 3), 3)
+        count = low if shallow else rng.randint(max(low, min(1, high)), max(low, high))
+        items = schema.get("items") or {}
+        return [synthesize(items, rng, defs, depth + 1) for _ in range(count)]
+    if kind == "object":
+        properties = schema.get("properties") or {}
+        required = set(schema.get("required", properties))
+        return {
+            name: synthesize(value, rng, defs, depth + 1)
+            for name, value in properties.items()
+            if name in required or not shallow
+        }
+    return None
+
+
+class MockLLMTransport(httpx.BaseTransport):
+    """
+    OpenAI compatible chat completions endpoint answering tool calls with values
+    synthesized from the requested tool's JSON schema, mounted into the factory's
+    CustomHTTPXClient for LLMProvider.MOCK.
+
+    Latency follows `settings.latency_distribution`: "fixed" sleeps `latency`
+    seconds, "lognormal" draws around a median of `latency` with `latency_sigma`,
+    "recorded" draws from `latency_samples`. A latency above the request's read
+    timeout raises httpx.ReadTimeout after the timeout, like a real server would.
+    Requests fail with 429 at `rate_limit_rate` and 500 at `error_rate`.
+    """
+
+    def __init__(self, settings: Any):
+        self.settings = settings
+        self._rng = random.Random(settings.seed)
+        self._lock = threading.Lock()
+        if settings.latency_distribution not in ("fixed", "lognormal", "recorded"):
+            raise ValueError(
+                f"Unknown latency distribution: {settings.latency_distribution}"
+            )
+        if settings.latency_distribution == "recorded" and not settings.latency_samples:
+            raise ValueError("Recorded latency distribution needs latency_samples")
+
+    def sample_latency(self) -> float:
+        settings = self.settings
+        with self._lock:
+            if settings.latency_distribution == "lognormal":
+                if settings.latency <= 0:
+                    return 0.0
+                return self._rng.lognormvariate(
+                    math.log(settings.latency), settings.latency_sigma
+                )
+            if settings.latency_distribution == "recorded":
+                return self._rng.choice(settings.latency_samples)
+            return settings.latency
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        latency = self.sample_latency()
+        read_timeout = (request.extensions.get("timeout") or {}).get("read")
+        if read_timeout is not None and latency > read_timeout:
+            time.sleep(read_timeout)
+            raise httpx.ReadTimeout("mock provider did not answer in time", request=request)
+        if latency > 0:
+            time.sleep(latency)
+
+        if request.method != "POST":
+            # warm-up and health check probes
+            return httpx.Response(200, request=request)
+        with self._lock:
+            draw = self._rng.random()
+        if draw < self.settings.rate_limit_rate:
+            return httpx.Response(
+                429,
+                headers={"retry-after": str(self.settings.retry_after)},
+                json={"error": {"type": "rate_limit_error", "message": "mock rate limit"}},
+                request=request,
+            )
+        if draw < self.settings.rate_limit_rate + self.settings.error_rate:
+            return httpx.Response(
+                500,
+                json={"error": {"type": "server_error", "message": "mock server error"}},
+                request=request,
+            )
+        if not request.url.path.endswith("/chat/completions"):
+            return httpx.Response(
+                404,
+                json={"error": {"type": "not_found", "message": "mock only serves chat completions"}},
+                request=request,
+            )
+        body = json.loads(request.content)
+        return httpx.Response(200, json=self.completion(body), request=request)
+
+    def completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        tools = body.get("tools") or []
+        choice = body.get("tool_choice")
+        if isinstance(choice, dict):
+            name = choice.get("function", {}).get("name")
+            tools = [t for t in tools if t["function"]["name"] == name] or tools
+        choices = []
+        output_chars = 0
+        for index in range(body.get("n") or 1):
+            if tools:
+                function = tools[0]["function"]
+                with self._lock:
+                    value = synthesize(function.get("parameters", {}), self._rng)
+                arguments = json.dumps(value)
+                output_chars += len(arguments)
+                message = {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": f"call_{uuid.uuid4().hex[:24]}",
+                            "type": "function",
+                            "function": {"name": function["name"], "arguments": arguments},
+                        }
+                    ],
+                }
+            else:
+                message = {"role": "assistant", "content": "mock response"}
+                output_chars += len(message["content"])
+            choices.append(
+                {
+                    "index": index,
+                    "finish_reason": "tool_calls" if tools else "stop",
+                    "message": message,
+                }
+            )
+
+        prompt_tokens = self.settings.prompt_tokens
+        if prompt_tokens is None:
+            prompt_tokens = math.ceil(len(json.dumps(body.get("messages", []))) / 4)
+        completion_tokens = self.settings.completion_tokens
+        if completion_tokens is None:
+            completion_tokens = math.ceil(output_chars / 4)
+        return {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", self.settings.default_model),
+            "choices": choices,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
@@ -0,0 +1,304 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from pydantic import BaseModel, Field, ValidationError, create_model
+
+from ava_mosaic_ai.token_budget import FRAMING_TOKENS
+
+try:
+    from instructor.core import IncompleteOutputException
+except ImportError:  # instructor < 1.10
+    from instructor.exceptions import IncompleteOutputException
+
+# failures of the packed response itself, anything else fails every item of the batch
+OUTPUT_ERRORS = (ValidationError, json.JSONDecodeError, IncompleteOutputException)
+
+PACKING_INSTRUCTIONS = (
+    "The user message holds several numbered inputs. Extract exactly one result per "
+    "input and set `index` to the number of the input it was extracted from."
+)
+
+
+class _Pending:
+    __slots__ = ("input", "trace_id", "future", "enqueued_at")
+
+    def __init__(self, input: str, trace_id: str):
+        self.input = input
+        self.trace_id = trace_id
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+def _raw_tasks(completion: Any) -> Optional[List[Any]]:
+    """The `tasks` list of an Iterable completion that failed validation, if it parses."""
+    try:
+        content = getattr(completion, "content", None)
+        if isinstance(content, list):
+            # Anthropic tool use
+            arguments = next(block.input for block in content if block.type == "tool_use")
+        else:
+            message = completion.choices[0].message
+            if message.tool_calls:
+                arguments = json.loads(message.tool_calls[0].function.arguments)
+            else:
+                arguments = json.loads(message.content)
+        tasks = arguments.get("tasks")
+        return tasks if isinstance(tasks, list) else None
+    except (AttributeError, IndexError, StopIteration, TypeError, ValueError):
+        return None
+
+
+def _is_output_error(exc: BaseException) -> bool:
+    """Whether a request failed on the model's output, which splitting the batch can fix."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, OUTPUT_ERRORS):
+            return True
+        # instructor raises InstructorRetryException from the last attempt's error,
+        # older versions from a tenacity RetryError holding it
+        last_attempt = getattr(exc, "last_attempt", None)
+        if last_attempt is not None and last_attempt.failed:
+            exc = last_attempt.exception()
+        else:
+            exc = exc.__cause__
+    return False
+
+
+class RequestPacker:
+    """
+    Packs many small, independent extractions for one response_model into single
+    requests.
+
+    Inputs submitted within `max_wait` seconds of each other are grouped, up to
+    `max_batch_size` per request, and sent as numbered inputs with an
+    `Iterable[Indexed<response_model>]` response model. Every caller gets its own
+    response_model instance, with its own trace_id and the audit data of the
+    packed request under "batch". Items missing from a response or failing
+    validation are split into smaller batches and re-run; a single item is run as
+    a plain create_completion with the usual instructor retries. Any other error
+    of a packed request, such as a rate limit or a spent budget, is raised to
+    every caller of the batch.
+
+    A packed request gets `max_tokens` per item, from the packer's `max_tokens`
+    or the observed usage of `response_model` when auto sizing is on, capped at
+    the provider's max_tokens. Without either it gets the provider's max_tokens.
+
+    A larger `max_batch_size` and `max_wait` save more requests and repeated
+    prompt tokens, a smaller one keeps the added queueing latency low.
+    """
+
+    def __init__(
+        self,
+        factory: Any,
+        response_model: Type[BaseModel],
+        instructions: str,
+        max_batch_size: int = 16,
+        max_wait: float = 0.05,
+        max_concurrency: int = 4,
+        **kwargs,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.factory = factory
+        self.response_model = response_model
+        self.instructions = instructions
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.kwargs = kwargs
+        self.indexed_model = create_model(
+            f"Indexed{response_model.__name__}",
+            __base__=response_model,
+            index=(int, Field(description="Number of the input this result belongs to")),
+        )
+        self._pending: List[_Pending] = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "items": 0, "splits": 0, "single": 0, "wait": 0.0}
+        self._thread = threading.Thread(target=self._collect, daemon=True)
+        self._thread.start()
+
+    def submit(self, input: str, trace_id: Optional[str] = None) -> Future:
+        """Queue one input, the future resolves to its response_model instance."""
+        item = _Pending(input, trace_id or str(uuid.uuid4()))
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("RequestPacker is closed")
+            self._pending.append(item)
+            self._condition.notify()
+        return item.future
+
+    def __call__(self, input: str, trace_id: Optional[str] = None) -> BaseModel:
+        return self.submit(input, trace_id).result()
+
+    def map(self, inputs: Iterable[str]) -> List[BaseModel]:
+        futures = [self.submit(input) for input in inputs]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Send what is still queued and wait for every batch to finish."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "RequestPacker":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def stats(self) -> Dict[str, float]:
+        """Batches sent, items packed, splits, single item fallbacks and mean batch size and wait."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["mean_batch_size"] = stats["items"] / batches if batches else 0.0
+        stats["mean_wait"] = stats.pop("wait") / stats["items"] if stats["items"] else 0.0
+        return stats
+
+    def _collect(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # wait for a full batch, at most max_wait after the oldest input
+                while len(self._pending) < self.max_batch_size and not self._closed:
+                    remaining = self._pending[0].enqueued_at + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[: self.max_batch_size]
+                del self._pending[: self.max_batch_size]
+            now = time.monotonic()
+            with self._stats_lock:
+                self._stats["batches"] += 1
+                self._stats["items"] += len(batch)
+                self._stats["wait"] += sum(now - item.enqueued_at for item in batch)
+            self._pool.submit(self._run, batch)
+
+    def _run(self, batch: List[_Pending]) -> None:
+        if len(batch) == 1:
+            self._run_single(batch[0])
+            return
+        try:
+            failed = self._run_batch(batch)
+        except Exception as exc:
+            # rate limits, outages, spent budgets: smaller batches would fail the same way
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            return
+        if failed:
+            with self._stats_lock:
+                self._stats["splits"] += 1
+            middle = len(failed) // 2 or 1
+            for part in (failed[:middle], failed[middle:]):
+                if part:
+                    self._run(part)
+
+    def _run_single(self, item: _Pending) -> None:
+        with self._stats_lock:
+            self._stats["single"] += 1
+        try:
+            result = self.factory.create_completion(
+                self.response_model,
+                [
+                    {"role": "system", "content": self.instructions},
+                    {"role": "user", "content": item.input},
+                ],
+                extra_headers={"x-trace-id": item.trace_id},
+                **self.kwargs,
+            )
+        except Exception as exc:
+            item.future.set_exception(exc)
+        else:
+            item.future.set_result(result)
+
+    def _run_batch(self, batch: List[_Pending]) -> List[_Pending]:
+        """Run one packed request, resolve the items it answered and return the others."""
+        factory = self.factory
+        kwargs = dict(self.kwargs)
+        # settings.max_tokens limits a whole request, not one packed item
+        limit = factory.settings.max_tokens
+        per_item = kwargs.pop("max_tokens", None)
+        if per_item is None and factory.settings.auto_max_tokens:
+            model = kwargs.get("model", factory.settings.default_model)
+            # observed usage only, None until enough completions were seen
+            per_item = factory.token_budget.budget(model, self.response_model)
+        if per_item is not None:
+            max_tokens = FRAMING_TOKENS + per_item * len(batch)
+            kwargs["max_tokens"] = max_tokens if limit is None else min(max_tokens, limit)
+        elif limit is not None:
+            kwargs["max_tokens"] = limit
+        # validation failures are handled by splitting, not by re-asking
+        kwargs["max_retries"] = 0
+
+        batch_trace_id = str(uuid.uuid4())
+        content = "\n\n".join(
+            f'<input index="{index}">\n{item.input}\n</input>' for index, item in enumerate(batch)
+        )
+        messages = [
+            {"role": "system", "content": f"{self.instructions}\n\n{PACKING_INSTRUCTIONS}"},
+            {"role": "user", "content": content},
+        ]
+        start_time = time.time()
+        try:
+            results = factory.create_completion(
+                Iterable[self.indexed_model],
+                messages,
+                extra_headers={"x-trace-id": batch_trace_id},
+                **kwargs,
+            )
+            tasks = list(results)
+            audit_data = getattr(results, "_audit_data", None)
+        except Exception as exc:
+            if not _is_output_error(exc):
+                raise
+            # keep the items that did validate, the rest is split and re-run
+            tasks = _raw_tasks(getattr(exc, "last_completion", None)) or []
+            request_data, response_data = factory.http_client.get_request_response_data(
+                batch_trace_id
+            )
+            audit_data = {
+                "trace_id": batch_trace_id,
+                "request_time": time.time() - start_time,
+                "http_request": request_data,
+                "http_response": response_data,
+                "error": f"{type(exc).__name__}: {exc}",
+            }
+
+        answered = set()
+        for task in tasks:
+            try:
+                if not isinstance(task, self.indexed_model):
+                    task = self.indexed_model.model_validate(task)
+                index = task.index
+                if not 0 <= index < len(batch) or index in answered:
+                    continue
+                result = self.response_model.model_validate(task.model_dump(exclude={"index"}))
+            except ValidationError:
+                continue
+            answered.add(index)
+            item = batch[index]
+            if audit_data is not None:
+                result.__dict__["_audit_data"] = {
+                    **audit_data,
+                    "trace_id": item.trace_id,
+                    "batch": {
+                        "trace_id": audit_data["trace_id"],
+                        "index": index,
+                        "size": len(batch),
+                    },
+                }
+            item.future.set_result(result)
+        return [item for index, item in enumerate(batch) if index not in answered]
@@ -0,0 +1,109 @@
+import string
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Type
+
+import instructor
+from pydantic import BaseModel
+
+# create_completion arguments accepted by PreparedCompletion.__call__ next to the variables
+CALL_OPTIONS = frozenset(["extra_headers", "trace_context", "timeout", "deadline", "priority"])
+
+
+def _template_fields(template: str) -> FrozenSet[str]:
+    # raises ValueError on malformed templates, so they fail when preparing
+    return frozenset(
+        field.split(".")[0].split("[")[0]
+        for _, field, _, _ in string.Formatter().parse(template)
+        if field is not None
+    )
+
+
+class PreparedCompletion:
+    """
+    A create_completion call with everything but a few template variables resolved
+    up front, like a prepared statement.
+
+    Message contents are `str.format` templates (`{{` and `}}` escape braces);
+    messages without placeholders are kept as they are. The settings defaults, the
+    instructor schema of `response_model` and the static headers are resolved once,
+    so each call only renders the variable messages; max_tokens is left to
+    create_completion, which sizes it from observed usage. Instances are immutable after
+    construction and safe to call from several threads.
+    """
+
+    def __init__(
+        self,
+        factory: Any,
+        response_model: Type[BaseModel],
+        messages: List[Dict[str, str]],
+        extra_headers: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ):
+        self.factory = factory
+        # instructor wraps plain models on every call, wrap once instead
+        self.response_model = instructor.openai_schema(response_model)
+        self.extra_headers = dict(extra_headers or {})
+        settings = factory.settings
+        self.params = {
+            **kwargs,
+            "model": kwargs.get("model", settings.default_model),
+            "temperature": kwargs.get("temperature", settings.temperature),
+            "max_retries": kwargs.get("max_retries", settings.max_retries),
+        }
+
+        # (message, None) for static messages, (message, template) for templated ones
+        self._messages: List[Tuple[Dict[str, str], Optional[str]]] = []
+        variables = set()
+        for message in messages:
+            content = message.get("content")
+            if not isinstance(content, str):
+                self._messages.append((dict(message), None))
+                continue
+            fields = _template_fields(content)
+            if fields:
+                self._messages.append((dict(message), content))
+            else:
+                # render static messages once, which only unescapes braces
+                self._messages.append(({**message, "content": content.format()}, None))
+            variables |= fields
+        if variables & CALL_OPTIONS:
+            raise ValueError(
+                f"Template variables clash with call options: {sorted(variables & CALL_OPTIONS)}"
+            )
+        self.variables: FrozenSet[str] = frozenset(variables)
+
+    def render(self, variables: Dict[str, Any]) -> List[Dict[str, str]]:
+        missing = self.variables - variables.keys()
+        if missing:
+            raise ValueError(f"Missing template variables: {sorted(missing)}")
+        messages = []
+        for message, template in self._messages:
+            # a fresh dict per call, some instructor modes edit messages in place
+            message = dict(message)
+            if template is not None:
+                message["content"] = template.format_map(variables)
+            messages.append(message)
+        return messages
+
+    def __call__(
+        self,
+        extra_headers: Optional[Dict[str, str]] = None,
+        trace_context: Any = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        priority: Optional[str] = None,
+        **variables,
+    ) -> BaseModel:
+        headers = self.extra_headers
+        if extra_headers:
+            headers = {**headers, **extra_headers}
+        return self.factory.create_completion(
+            self.response_model,
+            self.render(variables),
+            # create_completion copies the headers before adding trace ids
+            extra_headers=headers,
+            trace_context=trace_context,
+            timeout=timeout,
+            deadline=deadline,
+            priority=priority,
+            **self.params,
+        )
@@ -0,0 +1,203 @@
+import collections
+import threading
+import time
+from typing import Deque, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+from ava_mosaic_ai.deadline import DeadlineExceededError
+
+
+class PriorityClass(BaseModel):
+    # share of the capacity relative to the other classes with queued requests
+    weight: float = Field(default=1.0, gt=0)
+    # in-flight requests of this class, None for no cap besides the scheduler's
+    max_concurrency: Optional[int] = None
+    # queued requests of this class above which new ones are rejected
+    max_queue_length: Optional[int] = None
+    # queue latency target in seconds, requests expected or found to wait longer are shed
+    max_queue_wait: Optional[float] = None
+
+
+class SchedulerOverloadedError(RuntimeError):
+    """Raised when the scheduler sheds a request instead of queueing it."""
+
+
+class Ticket:
+    __slots__ = ("priority", "tag", "enqueued_at", "admitted", "event", "queue_time")
+
+    def __init__(self, priority: str, tag: float):
+        self.priority = priority
+        self.tag = tag
+        self.enqueued_at = time.monotonic()
+        self.admitted = False
+        self.event = threading.Event()
+        self.queue_time = 0.0
+
+
+class _ClassState:
+    def __init__(self, config: PriorityClass):
+        self.config = config
+        self.queue: Deque[Ticket] = collections.deque()
+        self.in_flight = 0
+        self.last_tag = 0.0
+        # exponentially weighted mean of the time a request holds its slot
+        self.service_time: Optional[float] = None
+        self.admitted = 0
+        self.shed = 0
+        self.total_queue_time = 0.0
+
+
+class RequestScheduler:
+    """
+    Admits requests from several priority classes into a shared concurrency budget.
+
+    Queued requests are dispatched by weighted fair queuing: each request gets a
+    virtual finish tag of `max(virtual time, class's last tag) + 1 / weight` and the
+    lowest tag among classes under their concurrency cap goes next. A request is
+    shed with SchedulerOverloadedError when its class queue is full, when the
+    expected wait exceeds the class `max_queue_wait`, or once it actually waited
+    that long.
+
+    One scheduler can be shared by several LLMFactory instances drawing on the
+    same provider quota.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        classes: Optional[Dict[str, PriorityClass]] = None,
+        default_priority: str = "default",
+    ):
+        classes = dict(classes or {})
+        classes.setdefault(default_priority, PriorityClass())
+        self.max_concurrency = max_concurrency
+        self.default_priority = default_priority
+        self._classes = {name: _ClassState(config) for name, config in classes.items()}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._virtual_time = 0.0
+
+    def acquire(
+        self, priority: Optional[str] = None, deadline: Optional[float] = None
+    ) -> Ticket:
+        """Block until a slot is free for `priority`, `deadline` is a time.monotonic() value."""
+        priority = priority or self.default_priority
+        if priority not in self._classes:
+            raise ValueError(f"Unknown priority class: {priority}")
+        state = self._classes[priority]
+        config = state.config
+
+        with self._lock:
+            # admission control only applies to requests that would have to queue
+            queued = not self._has_free_slot(state)
+            if (
+                queued
+                and config.max_queue_length is not None
+                and len(state.queue) >= config.max_queue_length
+            ):
+                state.shed += 1
+                raise SchedulerOverloadedError(f"Queue of priority class '{priority}' is full")
+            expected_wait = self._expected_wait(state) if queued else 0.0
+            if config.max_queue_wait is not None and expected_wait > config.max_queue_wait:
+                state.shed += 1
+                raise SchedulerOverloadedError(
+                    f"Expected queue wait {expected_wait:.3f}s of priority class "
+                    f"'{priority}' exceeds its target {config.max_queue_wait}s"
+                )
+            tag = max(self._virtual_time, state.last_tag) + 1.0 / config.weight
+            state.last_tag = tag
+            ticket = Ticket(priority, tag)
+            state.queue.append(ticket)
+            self._dispatch()
+
+        timeout = None
+        if config.max_queue_wait is not None:
+            timeout = config.max_queue_wait
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        if not ticket.event.wait(None if timeout is None else max(timeout, 0.0)):
+            with self._lock:
+                if not ticket.admitted:
+                    state.queue.remove(ticket)
+                    state.shed += 1
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise DeadlineExceededError("deadline exceeded while queued")
+                    raise SchedulerOverloadedError(
+                        f"Request of priority class '{priority}' waited longer than "
+                        f"{config.max_queue_wait}s"
+                    )
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        with self._lock:
+            state = self._classes[ticket.priority]
+            state.in_flight -= 1
+            self._in_flight -= 1
+            held = time.monotonic() - ticket.enqueued_at - ticket.queue_time
+            state.service_time = (
+                held if state.service_time is None else 0.8 * state.service_time + 0.2 * held
+            )
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._in_flight < self.max_concurrency:
+            candidates = [
+                state
+                for state in self._classes.values()
+                if state.queue
+                and (
+                    state.config.max_concurrency is None
+                    or state.in_flight < state.config.max_concurrency
+                )
+            ]
+            if not candidates:
+                return
+            state = min(candidates, key=lambda s: s.queue[0].tag)
+            ticket = state.queue.popleft()
+            self._virtual_time = ticket.tag
+            ticket.admitted = True
+            ticket.queue_time = time.monotonic() - ticket.enqueued_at
+            state.in_flight += 1
+            state.admitted += 1
+            state.total_queue_time += ticket.queue_time
+            self._in_flight += 1
+            ticket.event.set()
+
+    def _has_free_slot(self, state: _ClassState) -> bool:
+        return (
+            self._in_flight < self.max_concurrency
+            and not state.queue
+            and (
+                state.config.max_concurrency is None
+                or state.in_flight < state.config.max_concurrency
+            )
+        )
+
+    def _expected_wait(self, state: _ClassState) -> float:
+        if state.service_time is None or not state.queue:
+            return 0.0
+        # capacity share of this class among the classes currently competing
+        active_weight = sum(
+            s.config.weight for s in self._classes.values() if s.queue or s is state
+        )
+        capacity = self.max_concurrency * state.config.weight / active_weight
+        if state.config.max_concurrency is not None:
+            capacity = min(capacity, state.config.max_concurrency)
+        return len(state.queue) * state.service_time / max(capacity, 1e-9)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    "queued": len(state.queue),
+                    "in_flight": state.in_flight,
+                    "admitted": state.admitted,
+                    "shed": state.shed,
+                    "mean_queue_time": state.total_queue_time / state.admitted
+                    if state.admitted
+                    else 0.0,
+                }
+                for name, state in self._classes.items()
+            }
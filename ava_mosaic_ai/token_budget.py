@@ -0,0 +1,210 @@
+import collections
+import math
+import threading
+from typing import Any, Deque, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter
+
+# rough output sizes in tokens, JSON is denser in tokens than prose
+CHARS_PER_TOKEN = 3
+DEFAULT_STRING_TOKENS = 24
+DEFAULT_ARRAY_ITEMS = 8
+FORMAT_TOKENS = {"date": 6, "time": 6, "date-time": 12, "email": 10, "uuid": 20, "uri": 24}
+TYPE_TOKENS = {"integer": 4, "number": 6, "boolean": 2, "null": 2}
+# tool call or JSON framing around the arguments
+FRAMING_TOKENS = 16
+MAX_DEPTH = 8
+
+
+def _text_tokens(chars: int) -> int:
+    return math.ceil(chars / CHARS_PER_TOKEN) + 2
+
+
+def _estimate(schema: Dict[str, Any], defs: Dict[str, Any], depth: int) -> int:
+    if depth > MAX_DEPTH:
+        # recursive models, assume the recursion stops here
+        return DEFAULT_STRING_TOKENS
+    if "$ref" in schema:
+        return _estimate(defs.get(schema["$ref"].split("/")[-1], {}), defs, depth + 1)
+    if "const" in schema:
+        return _text_tokens(len(str(schema["const"])))
+    if "enum" in schema:
+        return max((_text_tokens(len(str(value))) for value in schema["enum"]), default=2)
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            return max(_estimate(option, defs, depth + 1) for option in schema[key])
+    if "allOf" in schema:
+        return sum(_estimate(part, defs, depth + 1) for part in schema["allOf"])
+
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(kind, list):
+        return max(_estimate({**schema, "type": option}, defs, depth) for option in kind)
+    if kind == "string":
+        if "maxLength" in schema:
+            return _text_tokens(schema["maxLength"])
+        if schema.get("format") in FORMAT_TOKENS:
+            return FORMAT_TOKENS[schema["format"]]
+        return DEFAULT_STRING_TOKENS
+    if kind == "array":
+        items = schema.get("maxItems", max(schema.get("minItems", 0), DEFAULT_ARRAY_ITEMS))
+        item = schema.get("items") or {}
+        return 2 + items * (_estimate(item, defs, depth + 1) + 1)
+    if kind == "object":
+        properties = schema.get("properties")
+        if properties is None:
+            # free-form mapping
+            value = schema.get("additionalProperties")
+            value_tokens = _estimate(value, defs, depth + 1) if isinstance(value, dict) else 8
+            return 2 + DEFAULT_ARRAY_ITEMS * (DEFAULT_STRING_TOKENS // 2 + value_tokens)
+        return 2 + sum(
+            _text_tokens(len(name)) + _estimate(value, defs, depth + 1) + 1
+            for name, value in properties.items()
+        )
+    return TYPE_TOKENS.get(kind, DEFAULT_STRING_TOKENS)
+
+
+def estimate_schema_tokens(response_model: Any) -> int:
+    """
+    Estimate the output tokens of a response_model instance from its JSON schema:
+    field names, `max_length` constraints, list bounds and enum values. Unbounded
+    strings and lists get fixed defaults.
+    """
+    if isinstance(response_model, type) and issubclass(response_model, BaseModel):
+        schema = response_model.model_json_schema()
+    else:
+        # Iterable[Model], List[Model], simple types
+        schema = TypeAdapter(response_model).json_schema()
+    return FRAMING_TOKENS + _estimate(schema, schema.get("$defs", {}), 0)
+
+
+def completion_usage(completion: Any) -> Tuple[Optional[int], bool]:
+    """Output tokens per choice of a raw OpenAI or Anthropic completion, and whether it was cut off."""
+    usage = getattr(completion, "usage", None)
+    tokens = getattr(usage, "completion_tokens", None)
+    if tokens is None:
+        tokens = getattr(usage, "output_tokens", None)
+    choices = getattr(completion, "choices", None) or []
+    truncated = getattr(completion, "stop_reason", None) == "max_tokens" or any(
+        getattr(choice, "finish_reason", None) == "length" for choice in choices
+    )
+    if tokens is not None and len(choices) > 1:
+        tokens = math.ceil(tokens / len(choices))
+    return tokens, truncated
+
+
+def _schema_key(response_model: Any) -> str:
+    # typing aliases such as Iterable[Model] share their __name__, their repr is distinct
+    if isinstance(response_model, type):
+        return response_model.__name__
+    return repr(response_model).replace("typing.", "")
+
+
+class _Observations:
+    def __init__(self, window: int):
+        self.tokens: Deque[int] = collections.deque(maxlen=window)
+        self.truncated = 0
+        # raised after a truncation, the budget never goes below it again
+        self.floor = 0
+
+
+class TokenBudgetEstimator:
+    """
+    Chooses max_tokens per (model, response_model).
+
+    Until `min_observations` completions have been seen, the budget never goes
+    below the `default` passed to `budget` (the provider's max_tokens, None for no
+    limit): it is the larger of `default` and the schema estimate times
+    `safety_factor`. After that it follows the largest output seen in the last
+    `window` completions times `headroom`, which is usually much tighter for
+    schemas with unbounded strings, and at least `min_tokens`. A truncated
+    completion doubles the budget that truncated it and keeps it as a floor.
+
+    The budget is capped at `max_tokens`, or at `default` when it is None, but
+    never below the largest output seen or the floor, so a budget that was
+    outgrown is raised instead of truncating every call.
+    """
+
+    def __init__(
+        self,
+        safety_factor: float = 1.5,
+        headroom: float = 1.25,
+        min_tokens: int = 64,
+        max_tokens: Optional[int] = None,
+        min_observations: int = 20,
+        window: int = 200,
+    ):
+        self.safety_factor = safety_factor
+        self.headroom = headroom
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.min_observations = min_observations
+        self.window = window
+        self._lock = threading.Lock()
+        self._schema_estimates: Dict[type, int] = {}
+        self._observations: Dict[Tuple[str, str], _Observations] = {}
+
+    def schema_estimate(self, response_model: Type[BaseModel]) -> int:
+        estimate = self._schema_estimates.get(response_model)
+        if estimate is None:
+            estimate = estimate_schema_tokens(response_model)
+            self._schema_estimates[response_model] = estimate
+        return estimate
+
+    def budget(
+        self, model: str, response_model: Type[BaseModel], default: Optional[int] = None
+    ) -> Optional[int]:
+        with self._lock:
+            observations = self._observations.get((model, _schema_key(response_model)))
+            if observations is None:
+                tokens, floor = [], 0
+            else:
+                tokens, floor = list(observations.tokens), observations.floor
+        if len(tokens) < self.min_observations:
+            # the schema estimate alone cannot tell how long free text gets
+            if default is None:
+                return None
+            budget = max(
+                default, math.ceil(self.schema_estimate(response_model) * self.safety_factor)
+            )
+        else:
+            budget = max(math.ceil(max(tokens) * self.headroom), self.min_tokens)
+        ceiling = self.max_tokens if self.max_tokens is not None else default
+        if ceiling is not None:
+            budget = min(budget, max(ceiling, max(tokens, default=0)))
+        return max(budget, floor)
+
+    def observe(
+        self,
+        model: str,
+        response_model: Type[BaseModel],
+        completion: Any,
+        max_tokens: Optional[int] = None,
+    ) -> None:
+        """Record the output usage of a raw completion returned for a `max_tokens` budget."""
+        tokens, truncated = completion_usage(completion)
+        if tokens is None and not truncated:
+            return
+        with self._lock:
+            observations = self._observations.setdefault(
+                (model, _schema_key(response_model)), _Observations(self.window)
+            )
+            if truncated:
+                observations.truncated += 1
+                observations.floor = max(
+                    observations.floor, 2 * (max_tokens or tokens or self.min_tokens)
+                )
+            elif tokens is not None:
+                observations.tokens.append(tokens)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per `model/response_model` observations, largest output, truncations and budget floor."""
+        with self._lock:
+            return {
+                f"{model}/{schema}": {
+                    "observations": len(observations.tokens),
+                    "max_output_tokens": max(observations.tokens, default=0),
+                    "truncated": observations.truncated,
+                    "floor": observations.floor,
+                }
+                for (model, schema), observations in self._observations.items()
+            }
@@ -0,0 +1,274 @@
+import contextvars
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+import httpx
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanContext(NamedTuple):
+    trace_id: str  # 32 hex characters
+    span_id: str  # 16 hex characters
+    sampled: bool
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C `traceparent` header, returns None when it is missing or invalid."""
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 0x01))
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+def extract_context(
+    carrier: Union[None, str, SpanContext, Dict[str, str]],
+) -> Optional[SpanContext]:
+    """Accept a traceparent string, a SpanContext or a dict of incoming headers."""
+    if carrier is None or isinstance(carrier, SpanContext):
+        return carrier
+    if isinstance(carrier, str):
+        return parse_traceparent(carrier)
+    headers = {k.lower(): v for k, v in carrier.items()}
+    return parse_traceparent(headers.get(TRACEPARENT_HEADER))
+
+
+class Span:
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        context: SpanContext,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+
+    @property
+    def traceparent(self) -> str:
+        return format_traceparent(self.context)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end_time is None else self.end_time - self.start_time
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if self.end_time is None:
+            self.end_time = time.time()
+            self.tracer.on_end(self)
+
+    def __repr__(self) -> str:
+        return f"Span(name={self.name!r}, trace_id={self.context.trace_id}, span_id={self.context.span_id})"
+
+
+class Tracer:
+    """
+    No-op tracer: spans carry ids so trace context is still propagated and the
+    head-based sampling decision is still made, but nothing is exported.
+
+    `sample_rate` applies to root spans only, child spans and spans continuing
+    an incoming trace context follow their parent's decision.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        self.sample_rate = sample_rate
+
+    def should_sample(self, trace_id: str) -> bool:
+        if self.sample_rate >= 1.0:
+            return True
+        # derive the decision from the trace id, so every process agrees on it
+        return int(trace_id[-16:], 16) / 2**64 < self.sample_rate
+
+    def start_span(
+        self,
+        name: str,
+        parent: Optional[SpanContext] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Span:
+        span_id = f"{random.getrandbits(64):016x}"
+        if parent is None:
+            trace_id = f"{random.getrandbits(128):032x}"
+            context = SpanContext(trace_id, span_id, self.should_sample(trace_id))
+        else:
+            context = SpanContext(parent.trace_id, span_id, parent.sampled)
+        return Span(
+            self,
+            name,
+            context,
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+
+    def on_end(self, span: Span) -> None:
+        pass
+
+
+NoOpTracer = Tracer
+
+
+class InMemorySpanExporter:
+    def __init__(self):
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class InMemoryTracer(Tracer):
+    """Tracer that keeps finished, sampled spans in memory, meant for tests."""
+
+    def __init__(self, sample_rate: float = 1.0, exporter: Optional[InMemorySpanExporter] = None):
+        super().__init__(sample_rate)
+        self.exporter = exporter or InMemorySpanExporter()
+
+    def on_end(self, span: Span) -> None:
+        if span.context.sampled:
+            self.exporter.export(span)
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Record spans with an OpenTelemetry tracer, requires `opentelemetry-api`.
+
+    Span ids and the sampling decision come from OpenTelemetry, so spans join the
+    traces of the configured provider and sampler.
+    """
+
+    def __init__(self, otel_tracer: Any = None):
+        try:
+            from opentelemetry import trace
+        except ImportError as exc:
+            raise ImportError(
+                "opentelemetry-api is required for OpenTelemetryTracer, install it with "
+                "`pip install ava-mosaic-ai[opentelemetry]`"
+            ) from exc
+        super().__init__()
+        self._trace = trace
+        self.otel_tracer = otel_tracer or trace.get_tracer("ava_mosaic_ai")
+
+    def start_span(
+        self,
+        name: str,
+        parent: Optional[SpanContext] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Span:
+        trace = self._trace
+        parent_context = None
+        if parent is not None:
+            parent_context = trace.set_span_in_context(
+                trace.NonRecordingSpan(
+                    trace.SpanContext(
+                        trace_id=int(parent.trace_id, 16),
+                        span_id=int(parent.span_id, 16),
+                        is_remote=True,
+                        trace_flags=trace.TraceFlags(
+                            trace.TraceFlags.SAMPLED if parent.sampled else 0
+                        ),
+                    )
+                )
+            )
+        otel_span = self.otel_tracer.start_span(
+            name, context=parent_context, attributes=attributes
+        )
+        otel_context = otel_span.get_span_context()
+        span = Span(
+            self,
+            name,
+            SpanContext(
+                f"{otel_context.trace_id:032x}",
+                f"{otel_context.span_id:016x}",
+                otel_context.trace_flags.sampled,
+            ),
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+        span.otel_span = otel_span
+        return span
+
+    def on_end(self, span: Span) -> None:
+        otel_span = span.otel_span
+        for key, value in span.attributes.items():
+            otel_span.set_attribute(key, value)
+        if span.status == "error":
+            otel_span.set_status(
+                self._trace.Status(self._trace.StatusCode.ERROR, span.error)
+            )
+        otel_span.end()
+
+
+# span of the create_completion call running in the current context
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "ava_mosaic_current_span", default=None
+)
+
+
+class HTTPTracingHook:
+    """Request hook creating one child span per HTTP attempt made by the SDK."""
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+
+    def before_send(self, request: httpx.Request) -> Optional[Span]:
+        parent = parse_traceparent(request.headers.get(TRACEPARENT_HEADER))
+        if parent is None:
+            return None
+        span = self.tracer.start_span(
+            "llm.http",
+            parent=parent,
+            attributes={"http.method": request.method, "http.url": str(request.url)},
+        )
+        request.headers[TRACEPARENT_HEADER] = span.traceparent
+        return span
+
+    def after_send(
+        self,
+        span: Optional[Span],
+        response: Optional[httpx.Response],
+        error: Optional[BaseException],
+    ) -> None:
+        if span is None:
+            return
+        if response is not None:
+            span.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 400:
+                span.status = "error"
+        if error is not None:
+            span.record_exception(error)
+        span.end()
@@ -0,0 +1,86 @@
+import json
+from typing import Any, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class StdlibJSONCodec:
+    name = "json"
+    decode_errors = (json.JSONDecodeError, UnicodeDecodeError)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any, indent: bool = False) -> str:
+        return json.dumps(obj, indent=2 if indent else None, default=str)
+
+
+class OrjsonCodec:
+    name = "orjson"
+    decode_errors = (orjson.JSONDecodeError,) if orjson else ()
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(self, obj: Any, indent: bool = False) -> str:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=str, option=option).decode()
+
+
+class MsgspecCodec:
+    name = "msgspec"
+    decode_errors = (msgspec.DecodeError,) if msgspec else ()
+
+    def __init__(self):
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder(enc_hook=str)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._decoder.decode(data)
+
+    def dumps(self, obj: Any, indent: bool = False) -> str:
+        encoded = self._encoder.encode(obj)
+        if indent:
+            encoded = msgspec.json.format(encoded, indent=2)
+        return encoded.decode()
+
+
+_CODECS = {
+    "orjson": (OrjsonCodec, orjson),
+    "msgspec": (MsgspecCodec, msgspec),
+    "json": (StdlibJSONCodec, json),
+}
+
+
+def available_codecs() -> List[str]:
+    """Names of the JSON codecs that can be used in this environment."""
+    return [name for name, (_, module) in _CODECS.items() if module is not None]
+
+
+def get_codec(name: Optional[str] = None):
+    """
+    Return a JSON codec by name, or the fastest installed one when `name` is None.
+
+    Preference order is orjson, msgspec, then the stdlib json module.
+    """
+    if name is not None:
+        if name not in _CODECS:
+            raise ValueError(f"Unknown JSON codec: {name}, expected one of {list(_CODECS)}")
+        codec_cls, module = _CODECS[name]
+        if module is None:
+            raise ImportError(f"JSON codec '{name}' is not installed")
+        return codec_cls()
+    for codec_cls, module in _CODECS.values():
+        if module is not None:
+            return codec_cls()
+
+
+default_codec = get_codec()
@@ -0,0 +1,171 @@
+"""
+Compare the memory held by 1000 audit records in the former response_cache
+layout (parsed request and response dicts) and in AuditStore, uncompressed and
+compressed, on chat payloads with a shared tool schema.
+
+    PYTHONPATH=. python benchmarks/bench_audit_memory.py
+"""
+import gc
+import json
+import random
+import time
+import timeit
+import tracemalloc
+import uuid
+from collections import OrderedDict
+
+import httpx
+
+from ava_mosaic_ai.audit_store import AuditStore, zstandard
+from ava_mosaic_ai.utils.json_codec import default_codec
+
+RECORDS = 1000
+WORDS = [
+    "".join(chr(97 + (i * 7 + j * 13) % 26) for j in range(3 + i % 7)) for i in range(5000)
+]
+
+
+def make_exchange(rng: random.Random, message_kb: int, messages: int = 8):
+    # random words, so bodies compress about as well as real prompts do
+    texts = [" ".join(rng.choice(WORDS) for _ in range(180 * message_kb)) for _ in range(messages)]
+    trace_id = str(uuid.uuid4())
+    body = {
+        "model": "gpt-4o",
+        "temperature": 0.0,
+        "max_tokens": 1024,
+        "messages": [
+            {"role": "user" if i % 2 else "assistant", "content": texts[i]}
+            for i in range(messages)
+        ],
+        "tools": [
+            {
+                "type": "function",
+                "function": {
+                    "name": "CompletionModel",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            f"field_{i}": {"type": "string", "description": "x" * 64}
+                            for i in range(32)
+                        },
+                    },
+                },
+            }
+        ],
+    }
+    request = httpx.Request(
+        "POST",
+        "https://api.openai.com/v1/chat/completions",
+        json=body,
+        headers={
+            "authorization": "Bearer sk-test",
+            "user-agent": "OpenAI/Python 1.41.0",
+            "x-stainless-lang": "python",
+            "x-trace-id": trace_id,
+            "traceparent": f"00-{uuid.uuid4().hex}-{uuid.uuid4().hex[:16]}-01",
+        },
+    )
+    arguments = json.dumps({f"field_{i}": texts[i][:200] for i in range(4)})
+    response = httpx.Response(
+        200,
+        json={
+            "id": f"chatcmpl-{trace_id}",
+            "object": "chat.completion",
+            "model": "gpt-4o",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {
+                        "role": "assistant",
+                        "tool_calls": [
+                            {
+                                "id": "call_0",
+                                "type": "function",
+                                "function": {"name": "CompletionModel", "arguments": arguments},
+                            }
+                        ],
+                    },
+                }
+            ],
+            "usage": {"prompt_tokens": 1000, "completion_tokens": 100, "total_tokens": 1100},
+        },
+        headers={
+            "x-request-id": f"req_{uuid.uuid4().hex}",
+            "openai-organization": "org-test",
+            "openai-processing-ms": "812",
+            "x-ratelimit-limit-requests": "10000",
+            "x-ratelimit-remaining-requests": "9999",
+        },
+    )
+    return trace_id, request, response
+
+
+def fill_legacy(exchanges):
+    cache = OrderedDict()
+    for trace_id, request, response in exchanges:
+        cache[trace_id] = {
+            "request": {
+                "method": request.method,
+                "url": str(request.url),
+                "headers": dict(request.headers),
+                "content": default_codec.loads(request.content),
+            },
+            "response": {
+                "status_code": response.status_code,
+                "headers": dict(response.headers),
+                "content": default_codec.loads(response.content),
+            },
+            "timestamp": time.time(),
+        }
+    return cache
+
+
+def fill_store(exchanges, compression):
+    store = AuditStore(max_size=RECORDS, compression=compression)
+    for trace_id, request, response in exchanges:
+        store.add(
+            trace_id,
+            request.method,
+            str(request.url),
+            response.status_code,
+            request_headers=request.headers,
+            response_headers=response.headers,
+            request_content=default_codec.loads(request.content),
+            response_content=response.content,
+        )
+    return store
+
+
+def measure(fill, exchanges):
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    cache = fill(exchanges)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return size, cache
+
+
+def main():
+    layouts = [("dicts", fill_legacy), ("store", lambda e: fill_store(e, None))]
+    layouts.append(("zlib", lambda e: fill_store(e, "zlib")))
+    if zstandard is not None:
+        layouts.append(("zstd", lambda e: fill_store(e, "zstd")))
+    for message_kb in (1, 8, 32):
+        rng = random.Random(message_kb)
+        exchanges = [make_exchange(rng, message_kb) for _ in range(RECORDS)]
+        print(f"{RECORDS} records, {len(exchanges[0][1].content) / 1024:.0f} KB requests")
+        for name, fill in layouts:
+            size, cache = measure(fill, exchanges)
+            trace_id = exchanges[-1][0]
+            if isinstance(cache, AuditStore):
+                read = timeit.timeit(lambda: cache.get(trace_id), number=200) / 200
+                print(f"  {name:<6} {size / 2**20:8.1f} MB   read {read * 1e6:8.1f} us")
+            else:
+                print(f"  {name:<6} {size / 2**20:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
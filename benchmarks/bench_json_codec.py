@@ -0,0 +1,55 @@
+"""
+Compare the JSON codecs used for audit capture on large chat payloads.
+
+    PYTHONPATH=. python benchmarks/bench_json_codec.py
+"""
+import timeit
+
+from ava_mosaic_ai.utils.json_codec import available_codecs, get_codec
+
+
+def make_payload(message_kb: int, messages: int = 8) -> dict:
+    text = ("lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20)[:1024]
+    return {
+        "model": "gpt-4o",
+        "temperature": 0.0,
+        "max_tokens": 1024,
+        "messages": [
+            {"role": "user" if i % 2 else "assistant", "content": text * message_kb}
+            for i in range(messages)
+        ],
+        "tools": [
+            {
+                "type": "function",
+                "function": {
+                    "name": "CompletionModel",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            f"field_{i}": {"type": "string", "description": "x" * 64}
+                            for i in range(32)
+                        },
+                    },
+                },
+            }
+        ],
+    }
+
+
+def main():
+    codecs = [get_codec(name) for name in available_codecs()]
+    for message_kb in (1, 16, 128):
+        payload = make_payload(message_kb)
+        encoded = get_codec("json").dumps(payload).encode()
+        print(f"payload {len(encoded) / 1024:.0f} KB")
+        for codec in codecs:
+            number = max(1, 2000 // message_kb)
+            loads = timeit.timeit(lambda: codec.loads(encoded), number=number) / number
+            dumps = timeit.timeit(lambda: codec.dumps(payload), number=number) / number
+            print(
+                f"  {codec.name:<8} loads {loads * 1e6:9.1f} us   dumps {dumps * 1e6:9.1f} us"
+            )
+
+
+if __name__ == "__main__":
+    main()
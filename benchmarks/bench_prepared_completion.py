@@ -0,0 +1,119 @@
+"""
+Compare plain create_completion with a prepared completion on a mocked transport,
+so only the client side overhead per call is measured.
+
+    PYTHONPATH=. python benchmarks/bench_prepared_completion.py
+"""
+import json
+import time
+from typing import List
+from unittest.mock import Mock, patch
+
+import httpx
+from pydantic import BaseModel, Field
+
+from ava_mosaic_ai.config.settings import LLMProvider, OpenAISettings, Settings
+from ava_mosaic_ai.llm_factory import CustomHTTPXClient, LLMFactory
+
+SYSTEM_PROMPT = "You extract people from short bios. " * 40
+
+
+class Person(BaseModel):
+    name: str = Field(description="Full name")
+    age: int = Field(ge=0, description="Age in years")
+    occupation: str
+    skills: List[str]
+
+
+RESPONSE = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o",
+    "choices": [
+        {
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": "call_0",
+                        "type": "function",
+                        "function": {
+                            "name": "Person",
+                            "arguments": json.dumps(
+                                {
+                                    "name": "Ada Lovelace",
+                                    "age": 36,
+                                    "occupation": "mathematician",
+                                    "skills": ["analysis", "programming"],
+                                }
+                            ),
+                        },
+                    }
+                ],
+            },
+        }
+    ],
+    "usage": {"prompt_tokens": 400, "completion_tokens": 30, "total_tokens": 430},
+}
+
+
+def make_factory() -> LLMFactory:
+    body = json.dumps(RESPONSE).encode()
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(
+            200, content=body, headers={"content-type": "application/json"}
+        )
+    )
+    settings = Mock(spec=Settings)
+    settings.get_provider_settings.return_value = OpenAISettings(api_key="bench")
+    with patch("ava_mosaic_ai.llm_factory.get_settings", return_value=settings):
+        return LLMFactory(LLMProvider.OPENAI, http_client=CustomHTTPXClient(transport=transport))
+
+
+def per_call(fn, number: int) -> float:
+    for _ in range(min(number, 50)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number
+
+
+def main(number: int = 2000):
+    llm = make_factory()
+    bio = "Ada Lovelace, 36, mathematician who wrote the first program."
+
+    def plain():
+        return llm.create_completion(
+            Person,
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": f"Bio: {bio}"},
+            ],
+            temperature=0.0,
+        )
+
+    prepared = llm.prepare_completion(
+        Person,
+        [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": "Bio: {bio}"},
+        ],
+        temperature=0.0,
+    )
+
+    plain_time = per_call(plain, number)
+    prepared_time = per_call(lambda: prepared(bio=bio), number)
+    print(f"create_completion   {plain_time * 1e6:9.1f} us/call")
+    print(
+        f"prepared completion {prepared_time * 1e6:9.1f} us/call"
+        f"   ({plain_time / prepared_time:.2f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-import json
 import uuid
 import instructor
 from openai import AzureOpenAI, OpenAI
@@ -53,5 +52,5 @@ user_info = client.create_completion(
 print(user_info)
 print(client.get_trace_id(response=user_info))
 
-print(json.dumps(client.get_audit_data(response=user_info), indent=4))
+print(client.dump_audit_data(response=user_info))
 # print(client.http_client.response_headers)
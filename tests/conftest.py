@@ -1,6 +1,8 @@
 import os
 import sys
+from unittest.mock import Mock, patch
 
+import httpx
 import pytest
 import urllib3
 import vcr
@@ -13,6 +15,10 @@ parent_dir = Path(__file__).resolve().parent.parent
 # Add the parent directory to sys.path
 sys.path.insert(0, str(parent_dir))
 
+from ava_mosaic_ai.config.settings import LLMProvider, OpenAISettings, Settings  # noqa: E402
+from ava_mosaic_ai.llm_factory import CustomHTTPXClient, LLMFactory  # noqa: E402
+from tests.helpers import chat_completion  # noqa: E402
+
 # def pytest_addoption(parser):
 #     parser.addoption(
 #         "--ci",
@@ -70,3 +76,33 @@ def no_http_requests(monkeypatch):
 def pytest_collection_modifyitems(items):
     for item in items:
         item.add_marker(pytest.mark.vcr)
+
+
+@pytest.fixture
+def make_factory():
+    """
+    Build an LLMFactory that answers its HTTP requests locally.
+
+    `responses` is either a list of tool call arguments, answered in order, or an
+    httpx handler. Returns the factory and the list of requests it sent.
+    """
+
+    def make(responses, provider=LLMProvider.OPENAI, provider_settings=None, **kwargs):
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append(request)
+            if callable(responses):
+                return responses(request)
+            return httpx.Response(200, json=chat_completion(responses.pop(0)))
+
+        settings = Mock(spec=Settings)
+        settings.get_provider_settings.return_value = provider_settings or OpenAISettings(
+            api_key="test_key"
+        )
+        http_client = CustomHTTPXClient(transport=httpx.MockTransport(handler))
+        with patch("ava_mosaic_ai.llm_factory.get_settings", return_value=settings):
+            factory = LLMFactory(provider, http_client=http_client, **kwargs)
+        return factory, seen
+
+    return make
@@ -0,0 +1,103 @@
+import json
+
+import httpx
+import pytest
+
+from ava_mosaic_ai.accounting import (
+    Budget,
+    BudgetExceededError,
+    ModelPrice,
+    UsageAccountant,
+    extract_usage,
+)
+from ava_mosaic_ai.tracing import Tracer
+from tests.helpers import MESSAGES, User, chat_completion
+
+
+@pytest.fixture
+def make_accounted_factory(make_factory):
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = chat_completion('{"name": "John", "age": 30}')
+        body["model"] = "gpt-4o-2024-08-06"
+        body["usage"] = {
+            "prompt_tokens": 1000,
+            "completion_tokens": 100,
+            "total_tokens": 1100,
+            "prompt_tokens_details": {"cached_tokens": 400},
+        }
+        return httpx.Response(200, json=body)
+
+    def make(accountant, metadata, sample_rate=1.0):
+        return make_factory(
+            handler,
+            metadata=metadata,
+            tracer=Tracer(sample_rate=sample_rate),
+            accountant=accountant,
+        )
+
+    return make
+
+
+def test_extract_usage_from_anthropic_body():
+    usage = extract_usage(
+        {
+            "model": "claude-3-5-sonnet",
+            "usage": {"input_tokens": 10, "output_tokens": 5, "cache_read_input_tokens": 90},
+        }
+    )
+    assert usage.prompt_tokens == 100
+    assert usage.cached_tokens == 90
+    assert usage.completion_tokens == 5
+    assert extract_usage({"error": "overloaded"}) is None
+
+
+def test_usage_is_counted_per_label(make_accounted_factory):
+    accountant = UsageAccountant(
+        prices={
+            "gpt-4o": ModelPrice(input=2.5, output=10.0, cached_input=1.25),
+            "gpt-4o-mini": ModelPrice(input=0.15, output=0.6),
+        },
+        metadata_keys=["tenant"],
+    )
+    factory, seen = make_accounted_factory(accountant, {"tenant": "acme", "session": "s-1"})
+
+    factory.create_completion(User, MESSAGES)
+    factory.create_completion(User, MESSAGES)
+
+    assert all("x-mosaic-model" not in request.headers for request in seen)
+    snapshot = accountant.snapshot()
+    assert snapshot["total"]["requests"] == 2
+    assert snapshot["by_tenant"]["acme"]["prompt_tokens"] == 2000
+    assert snapshot["by_model"]["gpt-4o"]["cached_tokens"] == 800
+    assert snapshot["by_response_model"]["User"]["completion_tokens"] == 200
+    assert "by_session" not in snapshot
+    # 600 input, 400 cached input and 100 output tokens per call
+    expected_cost = 2 * (600 * 2.5 + 400 * 1.25 + 100 * 10.0) / 1_000_000
+    assert snapshot["by_provider"]["openai"]["cost"] == pytest.approx(expected_cost)
+    assert snapshot["total"]["tokens_per_second"] > 0
+    assert json.loads(accountant.export())["total"]["requests"] == 2
+
+
+def test_unsampled_requests_are_counted(make_accounted_factory):
+    accountant = UsageAccountant()
+    factory, _ = make_accounted_factory(accountant, None, sample_rate=0.0)
+
+    user = factory.create_completion(User, MESSAGES)
+
+    assert "content" not in factory.get_audit_data(user)["http_response"]
+    assert accountant.snapshot()["total"]["prompt_tokens"] == 1000
+
+
+def test_budget_rejects_calls_once_spent(make_accounted_factory):
+    accountant = UsageAccountant(budgets={("tenant", "acme"): Budget(max_tokens=2000)})
+    factory, seen = make_accounted_factory(accountant, {"tenant": "acme"})
+
+    factory.create_completion(User, MESSAGES)
+    with pytest.raises(BudgetExceededError):
+        factory.create_completion(User, MESSAGES)
+        factory.create_completion(User, MESSAGES)
+    assert len(seen) == 2
+
+    accountant.reset()
+    factory.create_completion(User, MESSAGES)
+    assert len(seen) == 3
@@ -0,0 +1,113 @@
+import json
+import time
+
+import httpx
+import pytest
+
+from ava_mosaic_ai.audit_store import AuditStore, get_compression, zstandard
+from ava_mosaic_ai.llm_factory import CustomHTTPXClient
+from tests.helpers import chat_completion
+
+TOOLS = [{"type": "function", "function": {"name": "User", "parameters": {"type": "object"}}}]
+
+
+def request_body(content, tools=TOOLS):
+    return {"model": "gpt-4o", "messages": [{"role": "user", "content": content}], "tools": tools}
+
+
+def make_client(**kwargs):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200, json=chat_completion('{"name": "John", "age": 30}'), headers={"x-request-id": "r1"}
+        )
+
+    return CustomHTTPXClient(transport=httpx.MockTransport(handler), **kwargs)
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_records_read_back_as_request_and_response_data(compression):
+    client = make_client(audit_compression=compression)
+    body = request_body("John Doe is 30 years old.")
+
+    client.post("http://test/v1/chat/completions", json=body, headers={"x-trace-id": "t1"})
+    request_data, response_data = client.get_request_response_data("t1")
+
+    assert request_data["method"] == "POST"
+    assert request_data["url"] == "http://test/v1/chat/completions"
+    assert request_data["headers"]["x-trace-id"] == "t1"
+    assert request_data["content"] == body
+    assert response_data["status_code"] == 200
+    assert response_data["headers"]["x-request-id"] == "r1"
+    assert response_data["content"] == chat_completion('{"name": "John", "age": 30}')
+
+
+def test_unsampled_records_keep_no_bodies():
+    client = make_client()
+    traceparent = "00-" + "1" * 32 + "-" + "2" * 16 + "-00"
+
+    client.post(
+        "http://test/v1/chat/completions",
+        json=request_body("x"),
+        headers={"x-trace-id": "t1", "traceparent": traceparent},
+    )
+
+    assert client.get_request_response_data("t1") == (
+        {"method": "POST", "url": "http://test/v1/chat/completions"},
+        {"status_code": 200},
+    )
+
+
+def test_schemas_are_stored_once_and_released_with_their_records():
+    store = AuditStore(max_size=2, compression="zlib")
+    other_tools = [{"type": "function", "function": {"name": "Other"}}]
+
+    for i in range(2):
+        store.add(f"t{i}", "POST", "u", 200, {}, {}, request_body(str(i)), b"{}")
+    assert store.stats()["schemas"] == 1
+
+    store.add("t2", "POST", "u", 200, {}, {}, request_body("2", other_tools), b"{}")
+    assert store.stats()["schemas"] == 2
+    store.add("t3", "POST", "u", 200, {}, {}, request_body("3", other_tools), b"{}")
+    # both records referencing TOOLS were evicted
+    stats = store.stats()
+    assert stats["records"] == 2 and stats["schemas"] == 1
+    assert "t0" not in store and store.get("t0") == (None, None)
+    assert store.get("t3")[0]["content"]["tools"] == other_tools
+
+
+def test_only_repeating_header_values_are_shared_between_records():
+    store = AuditStore()
+    trace_ids = []
+    for i in range(2):
+        # built at runtime, so equal strings are distinct objects unless interned
+        content_type = "".join(["application/", "json"])
+        trace_ids.append("".join(["trace-", str(i)]))
+        headers = {"content-type": content_type, "x-trace-id": trace_ids[i]}
+        store.add(str(i), "POST", "u", 200, headers, headers, None, b"")
+
+    first, second = (store._records[str(i)].request_headers for i in range(2))
+    assert first[0] is second[0] and first[1] is second[1]
+    # per request values are stored as they are, not interned
+    assert first[3] is trace_ids[0] and second[3] is trace_ids[1]
+
+
+def test_expired_records_are_dropped():
+    store = AuditStore(ttl=0.01)
+    store.add("t1", "POST", "u", 200, {}, {}, request_body("x"), b"not json")
+    assert store.get("t1")[1]["content"] == "not json"
+
+    time.sleep(0.02)
+    store.clear_expired()
+
+    assert len(store) == 0 and store.stats()["schemas"] == 0
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        get_compression("lz4")
+    if zstandard is None:
+        with pytest.raises(ImportError):
+            AuditStore(compression="zstd")
+    else:
+        compress, decompress = get_compression("zstd")
+        assert decompress(compress(json.dumps(TOOLS).encode())) == json.dumps(TOOLS).encode()
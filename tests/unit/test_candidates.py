@@ -0,0 +1,87 @@
+import json
+
+import httpx
+import pytest
+
+from ava_mosaic_ai.candidates import vote
+from tests.helpers import MESSAGES, User, chat_completion
+
+
+def with_choices(*arguments):
+    """A handler answering with one choice per tool call arguments string."""
+    completion = chat_completion(arguments[0])
+    template = completion["choices"][0]
+    completion["choices"] = [
+        {
+            **template,
+            "index": index,
+            "message": {
+                **template["message"],
+                "tool_calls": [
+                    {
+                        **template["message"]["tool_calls"][0],
+                        "function": {"name": "User", "arguments": args},
+                    }
+                ],
+            },
+        }
+        for index, args in enumerate(arguments)
+    ]
+    return lambda request: httpx.Response(200, json=completion)
+
+
+def test_n_candidates_rescue_invalid_first_choice(make_factory):
+    factory, seen = make_factory(
+        with_choices('{"name": "John", "age": "old"}', '{"name": "John", "age": 30}')
+    )
+
+    user = factory.create_completion(User, MESSAGES, candidates=2)
+
+    assert (user.name, user.age) == ("John", 30)
+    assert len(seen) == 1
+    assert json.loads(seen[0].content)["n"] == 2
+    audit_data = factory.get_audit_data(user)
+    assert audit_data["candidates"]["mode"] == "n"
+    assert audit_data["candidates"]["valid"] == 1
+    assert audit_data["http_response"]["status_code"] == 200
+    stats = factory.candidate_stats.snapshot()["User"]
+    assert stats["rescued"] == 1
+    assert stats["first_valid_rate"] == 0.0
+
+
+def test_n_candidates_with_vote(make_factory):
+    factory, _ = make_factory(
+        with_choices(
+            '{"name": "Jon", "age": 30}',
+            '{"name": "John", "age": 30}',
+            '{"name": "John", "age": 30}',
+        )
+    )
+
+    user = factory.create_completion(User, MESSAGES, candidates=3, select=vote)
+
+    assert user.name == "John"
+    assert factory.candidate_stats.snapshot()["User"]["valid_rate"] == 1.0
+
+
+def test_no_valid_candidate_raises(make_factory):
+    factory, _ = make_factory(
+        with_choices('{"name": "John", "age": "old"}', '{"name": "John"}')
+    )
+
+    with pytest.raises(Exception):
+        factory.create_completion(User, MESSAGES, candidates=2)
+    assert factory.candidate_stats.snapshot()["User"]["failed"] == 1
+
+
+def test_concurrent_candidates_without_n_support(make_factory):
+    factory, seen = make_factory(['{"name": "John", "age": 30}'] * 3)
+    factory.CANDIDATE_N_PROVIDERS = ()
+
+    user = factory.create_completion(User, MESSAGES, candidates=3, select=vote)
+
+    assert user.age == 30
+    assert len(seen) == 3
+    assert len({request.headers["x-trace-id"] for request in seen}) == 3
+    assert all("n" not in json.loads(request.content) for request in seen)
+    assert factory.get_audit_data(user)["candidates"]["mode"] == "concurrent"
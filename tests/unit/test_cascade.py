@@ -0,0 +1,90 @@
+import json
+
+import httpx
+import pytest
+from pydantic import BaseModel
+
+from ava_mosaic_ai.cascade import CascadeTier
+from tests.helpers import MESSAGES, chat_completion
+
+
+class User(BaseModel):
+    name: str
+    age: int
+
+    def cascade_accept(self) -> bool:
+        return self.age > 0
+
+
+@pytest.fixture
+def make_cascade_factory(make_factory):
+    def make(arguments_by_model):
+        models_seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            model = json.loads(request.content)["model"]
+            models_seen.append(model)
+            return httpx.Response(200, json=chat_completion(arguments_by_model[model]))
+
+        factory, _ = make_factory(handler)
+        return factory, models_seen
+
+    return make
+
+
+TIERS = [{"model": "small", "attempts": 2}, CascadeTier(model="large")]
+
+
+def test_cascade_stops_at_first_accepted_tier(make_cascade_factory):
+    factory, models_seen = make_cascade_factory({"small": '{"name": "John", "age": 30}'})
+
+    user = factory.create_cascade_completion(User, MESSAGES, tiers=TIERS)
+
+    assert user.age == 30
+    assert models_seen == ["small"]
+    report = factory.get_audit_data(user)["cascade"]
+    assert [t["outcome"] for t in report] == ["accepted"]
+
+
+def test_cascade_escalates_on_validation_failure(make_cascade_factory):
+    factory, models_seen = make_cascade_factory(
+        {"small": '{"name": "John"}', "large": '{"name": "John", "age": 30}'}
+    )
+
+    user = factory.create_cascade_completion(User, MESSAGES, tiers=TIERS)
+
+    assert user.age == 30
+    assert models_seen == ["small", "small", "large"]
+    report = factory.get_audit_data(user)["cascade"]
+    assert [(t["model"], t["outcome"]) for t in report] == [
+        ("small", "error"),
+        ("large", "accepted"),
+    ]
+    stats = factory.cascade_stats.snapshot()
+    assert stats["openai/small"]["errors"] == 1
+    assert stats["openai/large"]["success_rate"] == 1.0
+
+
+def test_cascade_escalates_on_rejected_confidence_check(make_cascade_factory):
+    factory, models_seen = make_cascade_factory(
+        {"small": '{"name": "John", "age": -1}', "large": '{"name": "John", "age": -2}'}
+    )
+
+    user = factory.create_cascade_completion(User, MESSAGES, tiers=TIERS)
+
+    # nothing passed the check, the last rejected result is returned
+    assert user.age == -2
+    assert models_seen == ["small", "large"]
+
+    user = factory.create_cascade_completion(
+        User, MESSAGES, tiers=TIERS, accept=lambda result: True
+    )
+    assert user.age == -1
+
+
+def test_cascade_raises_when_every_tier_fails(make_cascade_factory):
+    factory, _ = make_cascade_factory(
+        {"small": '{"name": "John"}', "large": '{"name": "John"}'}
+    )
+    with pytest.raises(Exception):
+        factory.create_cascade_completion(User, MESSAGES, tiers=TIERS)
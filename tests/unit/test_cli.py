@@ -0,0 +1,141 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from pydantic import BaseModel
+
+from ava_mosaic_ai.cli import BatchCheckpoint, WorkerError, import_object, run_batch
+
+
+class User(BaseModel):
+    name: str
+    age: int
+
+
+class FakeFactory:
+    def __init__(self, provider, metadata=None):
+        self.calls = 0
+
+    def create_completion(self, response_model, messages, **kwargs):
+        content = messages[-1]["content"]
+        if content == "fail":
+            raise ValueError("validation failed")
+        name, age = content.split(",")
+        result = response_model(name=name, age=int(age))
+        result.__dict__["_audit_data"] = {"trace_id": f"trace-{name}"}
+        return result
+
+    @staticmethod
+    def get_audit_data(response):
+        return response.__dict__.get("_audit_data")
+
+    @staticmethod
+    def get_trace_id(response):
+        return response.__dict__["_audit_data"]["trace_id"]
+
+
+class BrokenFactory:
+    def __init__(self, provider, metadata=None):
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+
+
+def write_input(path, contents):
+    with open(path, "w") as f:
+        for content in contents:
+            f.write(json.dumps({"id": content, "messages": [{"role": "user", "content": content}]}) + "\n")
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_import_object():
+    assert import_object(f"{__name__}:User") is User
+    assert import_object(f"{__name__}.User") is User
+    with pytest.raises(ValueError):
+        import_object("User")
+
+
+def test_checkpoint_watermark(tmp_path):
+    checkpoint = BatchCheckpoint(str(tmp_path / "ckpt"))
+    for line in (0, 2, 3):
+        checkpoint.mark_done(line)
+    assert checkpoint.watermark == 1
+    assert checkpoint.done == {2, 3}
+    checkpoint.save()
+
+    resumed = BatchCheckpoint(str(tmp_path / "ckpt"))
+    assert [resumed.is_done(line) for line in range(5)] == [True, False, True, True, False]
+    resumed.mark_done(1)
+    assert resumed.watermark == 4
+    assert resumed.done == set()
+
+
+def test_run_batch_in_process(tmp_path):
+    input_path = tmp_path / "input.jsonl"
+    write_input(input_path, ["ann,30", "fail", "bob,41"])
+    output_path = tmp_path / "output.jsonl"
+    audit_path = tmp_path / "audit.jsonl"
+
+    with patch("ava_mosaic_ai.llm_factory.LLMFactory", FakeFactory):
+        stats = run_batch(
+            str(input_path),
+            str(output_path),
+            provider="openai",
+            response_model=f"{__name__}:User",
+            audit_path=str(audit_path),
+            workers=0,
+            concurrency=2,
+        )
+
+    assert stats == {"ok": 2, "errors": 1}
+    records = sorted(read_jsonl(output_path), key=lambda r: r["line"])
+    assert records[0]["result"] == {"name": "ann", "age": 30}
+    assert records[1]["error"].startswith("ValueError")
+    assert {r["trace_id"] for r in read_jsonl(audit_path)} == {"trace-ann", "trace-bob"}
+    assert BatchCheckpoint(str(output_path) + ".checkpoint").watermark == 3
+
+
+def test_run_batch_resumes_from_checkpoint(tmp_path):
+    input_path = tmp_path / "input.jsonl"
+    write_input(input_path, ["ann,30", "bob,41", "cat,52"])
+    output_path = tmp_path / "output.jsonl"
+    checkpoint = BatchCheckpoint(str(output_path) + ".checkpoint")
+    checkpoint.mark_done(0)
+    checkpoint.mark_done(2)
+    checkpoint.save()
+
+    with patch("ava_mosaic_ai.llm_factory.LLMFactory", FakeFactory):
+        run_batch(
+            str(input_path),
+            str(output_path),
+            provider="openai",
+            response_model=f"{__name__}:User",
+            workers=0,
+        )
+
+    assert [r["id"] for r in read_jsonl(output_path)] == ["bob,41"]
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+@pytest.mark.parametrize("workers", [0, 1])
+def test_run_batch_fails_fast_when_a_worker_dies(tmp_path, workers):
+    input_path = tmp_path / "input.jsonl"
+    # more lines than the task queue holds, so feeding would block on a dead worker
+    write_input(input_path, [f"user{i},{i}" for i in range(50)])
+    output_path = tmp_path / "output.jsonl"
+
+    # spawned workers do not see the patch, an unknown provider fails their startup
+    with patch("ava_mosaic_ai.llm_factory.LLMFactory", BrokenFactory):
+        with pytest.raises(WorkerError, match="Worker 0 exited"):
+            run_batch(
+                str(input_path),
+                str(output_path),
+                provider="openai" if workers == 0 else "no-such-provider",
+                response_model=f"{__name__}:User",
+                workers=workers,
+                concurrency=2,
+            )
+
+    assert BatchCheckpoint(str(output_path) + ".checkpoint").watermark == 0
@@ -0,0 +1,114 @@
+import time
+
+import httpx
+import pytest
+
+from ava_mosaic_ai.deadline import (
+    DEADLINE_HEADER,
+    DeadlineExceededError,
+    deadline_retrying,
+    sdk_retry_delay,
+)
+from tests.helpers import MESSAGES, User, chat_completion
+
+
+@pytest.fixture
+def make_slow_factory(make_factory):
+    def make(latency, arguments='{"name": "John Doe", "age": 30}'):
+        def handler(request: httpx.Request) -> httpx.Response:
+            read_timeout = request.extensions["timeout"]["read"]
+            if latency > read_timeout:
+                time.sleep(read_timeout)
+                raise httpx.ReadTimeout("timed out", request=request)
+            time.sleep(latency)
+            return httpx.Response(200, json=chat_completion(arguments))
+
+        return make_factory(handler)
+
+    return make
+
+
+def test_timeout_caps_attempt_timeouts(make_slow_factory):
+    factory, seen = make_slow_factory(latency=0)
+
+    factory.create_completion(response_model=User, messages=MESSAGES, timeout=2.0)
+
+    timeouts = seen[0].extensions["timeout"]
+    assert timeouts["read"] <= 2.0
+    assert timeouts["connect"] <= 2.0
+    assert DEADLINE_HEADER not in seen[0].headers
+
+
+def test_deadline_exceeded_is_not_retried(make_slow_factory):
+    factory, seen = make_slow_factory(latency=5)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        factory.create_completion(
+            response_model=User, messages=MESSAGES, max_retries=3, timeout=0.3
+        )
+
+    assert time.monotonic() - start < 1.0
+    assert len(seen) == 1
+
+
+def test_retry_skipped_when_budget_cannot_fit_attempt(make_slow_factory):
+    factory, seen = make_slow_factory(latency=0.3, arguments='{"name": "John"}')
+
+    with pytest.raises(Exception) as exc_info:
+        factory.create_completion(
+            response_model=User, messages=MESSAGES, max_retries=3, timeout=0.5
+        )
+
+    assert not isinstance(exc_info.value, DeadlineExceededError)
+    assert len(seen) == 1
+
+
+def test_expired_deadline_fails_fast(make_slow_factory):
+    factory, seen = make_slow_factory(latency=0)
+
+    with pytest.raises(DeadlineExceededError):
+        factory.create_completion(
+            response_model=User, messages=MESSAGES, deadline=time.monotonic() - 1
+        )
+    assert seen == []
+
+
+def test_sdk_retry_waiting_past_the_deadline_is_cancelled(make_factory):
+    factory, seen = make_factory(
+        lambda request: httpx.Response(
+            429, json={"error": {"message": "rate limited"}}, headers={"retry-after": "5"}
+        )
+    )
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        factory.create_completion(response_model=User, messages=MESSAGES, timeout=1.0)
+
+    assert time.monotonic() - start < 1.0
+    assert len(seen) == 1
+
+
+def test_sdk_retry_delay():
+    request = httpx.Request("POST", "http://test")
+
+    def delay(status, **headers):
+        return sdk_retry_delay(httpx.Response(status, headers=headers, request=request))
+
+    assert delay(429, **{"retry-after": "5"}) == 5.0
+    assert delay(503, **{"retry-after-ms": "250"}) == 0.25
+    assert delay(500) == 0.5
+    assert delay(400) is None
+    assert delay(400, **{"x-should-retry": "true"}) == 0.5
+    assert delay(429, **{"x-should-retry": "false"}) is None
+    # the SDK does not wait that long, it raises instead
+    assert delay(429, **{"retry-after": "120"}) is None
+
+
+def test_deadline_retries_what_instructor_retries():
+    errors = pytest.importorskip("instructor.core")
+    retrying = deadline_retrying(2, time.monotonic() + 60)
+
+    assert retrying.retry.predicate(errors.ResponseParsingError("no tool call"))
+    assert retrying.retry.predicate(errors.AsyncValidationError("invalid"))
+    assert not retrying.retry.predicate(ValueError("other"))
@@ -0,0 +1,97 @@
+import base64
+import json
+
+import httpx
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+
+from ava_mosaic_ai.config.settings import LLMProvider, OpenAISettings, Settings
+from ava_mosaic_ai.embeddings import EmbeddingCache
+from ava_mosaic_ai.llm_factory import LLMFactory
+
+
+def fake_embedding(text: str) -> np.ndarray:
+    return np.array([len(text), text.count("a"), 1.0], dtype=np.float32)
+
+
+@pytest.fixture
+def requests_seen():
+    return []
+
+
+@pytest.fixture
+def factory(make_factory, requests_seen):
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests_seen.append(body)
+        assert body["encoding_format"] == "base64"
+        data = [
+            {
+                "object": "embedding",
+                "index": i,
+                "embedding": base64.b64encode(fake_embedding(text).tobytes()).decode(),
+            }
+            for i, text in enumerate(body["input"])
+        ]
+        return httpx.Response(
+            200,
+            json={
+                "object": "list",
+                "data": data,
+                "model": body["model"],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            },
+        )
+
+    factory, _ = make_factory(
+        handler, provider_settings=OpenAISettings(api_key="test_key", embedding_batch_size=2)
+    )
+    return factory
+
+
+def test_create_embeddings_batches_inputs(factory, requests_seen):
+    texts = ["a", "bb", "aaa", "dddd", "aaaaa"]
+    embeddings = factory.create_embeddings(texts)
+
+    assert embeddings.dtype == np.float32
+    assert embeddings.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(embeddings, np.stack([fake_embedding(t) for t in texts]))
+    assert sorted(len(r["input"]) for r in requests_seen) == [1, 2, 2]
+    # embedding responses are not kept in the audit cache
+    assert len(factory.http_client.response_cache) == 0
+
+
+def test_create_embeddings_uses_cache(factory, requests_seen):
+    cache = EmbeddingCache()
+    factory.create_embeddings(["a", "bb"], cache=cache)
+    embeddings = factory.create_embeddings(["bb", "ccc", "a"], cache=cache)
+
+    assert len(requests_seen) == 2
+    assert requests_seen[1]["input"] == ["ccc"]
+    np.testing.assert_array_equal(embeddings[2], fake_embedding("a"))
+    assert len(cache) == 3
+
+
+def test_create_embeddings_unsupported_provider():
+    settings = Mock(spec=Settings)
+    settings.get_provider_settings.return_value = Mock(
+        api_key="test_key",
+        api_keys=[],
+        key_selection="round_robin",
+        key_cooldown=60.0,
+        endpoints=[],
+        trace_sample_rate=1.0,
+        audit_compression=None,
+        connect_timeout=5.0,
+        read_timeout=600.0,
+        warmup_connections=0,
+        warmup_probe_interval=None,
+        keepalive_expiry=5.0,
+    )
+    with patch("ava_mosaic_ai.llm_factory.get_settings", return_value=settings), patch(
+        "ava_mosaic_ai.llm_factory.instructor"
+    ):
+        factory = LLMFactory(LLMProvider.ANTHROPIC)
+    with pytest.raises(ValueError, match="not supported"):
+        factory.create_embeddings(["a"])
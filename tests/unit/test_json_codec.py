@@ -0,0 +1,26 @@
+import pytest
+
+from ava_mosaic_ai.llm_factory import CustomHTTPXClient
+from ava_mosaic_ai.utils.json_codec import available_codecs, get_codec
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_codec_round_trip(name):
+    codec = get_codec(name)
+    payload = {"messages": [{"role": "user", "content": "héllo"}], "n": 1.5}
+    assert codec.loads(codec.dumps(payload)) == payload
+    assert codec.loads(codec.dumps(payload).encode()) == payload
+    assert codec.loads(codec.dumps(payload, indent=True)) == payload
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_parse_json_falls_back_to_text(name):
+    client = CustomHTTPXClient(json_codec=get_codec(name))
+    assert client._parse_json(b'{"a": 1}') == {"a": 1}
+    assert client._parse_json(b"not json") == "not json"
+    assert client._parse_json("not json") == "not json"
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("yaml")
@@ -0,0 +1,59 @@
+import httpx
+import pytest
+
+from ava_mosaic_ai.key_pool import APIKeyPool
+from ava_mosaic_ai.llm_factory import CustomHTTPXClient, RequestRoute, ROUTE_HEADER
+
+
+def test_round_robin_rotates_keys():
+    pool = APIKeyPool(["a", "b", "c"], header_name="x-api-key")
+    assert [pool.acquire() for _ in range(6)] == ["a", "b", "c", "a", "b", "c"]
+
+
+def test_throttled_key_is_skipped_until_cooldown_ends():
+    pool = APIKeyPool(["a", "b"], header_name="x-api-key", cooldown=60.0)
+    pool.mark_throttled("a")
+    assert {pool.acquire() for _ in range(4)} == {"b"}
+
+    pool.mark_throttled("a", retry_after=0)
+    assert {pool.acquire() for _ in range(4)} == {"a", "b"}
+
+
+def test_least_recently_throttled_prefers_never_throttled_keys():
+    pool = APIKeyPool(
+        ["a", "b"], header_name="x-api-key", strategy="least_recently_throttled"
+    )
+    pool.mark_throttled("a", retry_after=0)
+    assert pool.acquire() == "b"
+
+
+def test_invalid_pool_configuration():
+    with pytest.raises(ValueError):
+        APIKeyPool([], header_name="x-api-key")
+    with pytest.raises(ValueError):
+        APIKeyPool(["a"], header_name="x-api-key", strategy="random")
+
+
+def test_pool_rewrites_header_and_cools_down_on_429():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers["authorization"])
+        assert ROUTE_HEADER not in request.headers
+        status = 429 if request.headers["authorization"] == "Bearer a" else 200
+        return httpx.Response(status, json={}, headers={"retry-after": "30"})
+
+    pool = APIKeyPool(["a", "b"], header_name="authorization", header_format="Bearer {key}")
+    route = RequestRoute(hooks=[pool])
+    client = CustomHTTPXClient(transport=httpx.MockTransport(handler))
+    route_id = client.register_route(route)
+
+    for i in range(3):
+        client.post(
+            "https://api.test/v1/chat",
+            json={},
+            headers={"x-trace-id": str(i), ROUTE_HEADER: route_id},
+        )
+
+    assert seen == ["Bearer a", "Bearer b", "Bearer b"]
+    assert [s["throttles"] for s in pool.stats()] == [1, 0]
@@ -24,6 +24,18 @@ def mock_settings():
         temperature=0.7,
         max_retries=3,
         max_tokens=100,
+        auto_max_tokens=False,
+        api_keys=[],
+        key_selection="round_robin",
+        key_cooldown=60.0,
+        endpoints=[],
+        trace_sample_rate=1.0,
+        audit_compression=None,
+        connect_timeout=5.0,
+        read_timeout=600.0,
+        warmup_connections=0,
+        warmup_probe_interval=None,
+        keepalive_expiry=5.0,
     )
     return settings
 
@@ -74,6 +86,18 @@ def test_initialize_client_llama(mock_instructor):
         temperature=0.7,
         max_retries=3,
         max_tokens=100,
+        auto_max_tokens=False,
+        api_keys=[],
+        key_selection="round_robin",
+        key_cooldown=60.0,
+        endpoints=[],
+        trace_sample_rate=1.0,
+        audit_compression=None,
+        connect_timeout=5.0,
+        read_timeout=600.0,
+        warmup_connections=0,
+        warmup_probe_interval=None,
+        keepalive_expiry=5.0,
     )
     with patch("ava_mosaic_ai.llm_factory.get_settings", return_value=settings) as mock:
         factory = LLMFactory(LLMProvider.LLAMA)
@@ -152,3 +176,9 @@ def test_create_completion_with_custom_params(llm_factory):
         messages=messages,
     )
 
+
+
+def test_api_key_setter_rotates_key_without_rebuilding_client(llm_factory, mock_instructor):
+    llm_factory.api_key = "rotated_key"
+    assert llm_factory.key_pool.keys == ["rotated_key"]
+    mock_instructor.from_openai.assert_called_once()
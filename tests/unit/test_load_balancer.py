@@ -0,0 +1,124 @@
+import httpx
+import pytest
+
+from ava_mosaic_ai.config.settings import EndpointSettings, _get_env_endpoints
+from ava_mosaic_ai.llm_factory import CustomHTTPXClient, RequestRoute, ROUTE_HEADER
+from ava_mosaic_ai.load_balancer import EndpointBalancer
+
+
+def make_balancer(**kwargs):
+    endpoints = [
+        EndpointSettings(url="http://box-a:11434/v1", weight=2),
+        EndpointSettings(url="http://box-b:11434/v1", weight=1),
+    ]
+    return EndpointBalancer("http://localhost:11434/v1", endpoints, **kwargs)
+
+
+def test_weighted_round_robin_respects_weights():
+    balancer = make_balancer()
+    picks = []
+    for _ in range(6):
+        endpoint = balancer.select()
+        picks.append(endpoint.url.host)
+        balancer.after_send(endpoint, httpx.Response(200), None)
+    assert picks.count("box-a") == 4
+    assert picks.count("box-b") == 2
+
+
+def test_least_outstanding_avoids_busy_endpoint():
+    balancer = make_balancer(strategy="least_outstanding")
+    picks = [balancer.select().url.host for _ in range(3)]
+    # box-a has twice the weight, so it takes two in-flight requests first
+    assert picks == ["box-a", "box-a", "box-b"]
+
+
+def test_consecutive_failures_eject_endpoint():
+    balancer = make_balancer(consecutive_failures=2, ejection_time=60)
+    box_a = balancer.endpoints[0]
+    for _ in range(2):
+        balancer.select()
+        balancer.after_send(box_a, None, httpx.ConnectError("down"))
+
+    assert {balancer.select().url.host for _ in range(5)} == {"box-b"}
+    assert balancer.stats()[0]["ejected"] is True
+
+
+def test_rejected_credentials_eject_endpoint():
+    balancer = make_balancer(consecutive_failures=2, ejection_time=60)
+    box_a = balancer.endpoints[0]
+    for status in (401, 403):
+        balancer.select()
+        balancer.after_send(box_a, httpx.Response(status), None)
+
+    assert balancer.stats()[0]["ejected"] is True
+
+
+def test_endpoints_from_environment(monkeypatch):
+    monkeypatch.setenv(
+        "TEST_ENDPOINTS",
+        "https://east.example.com|2|gpt-4o-east|key-east, https://west.example.com",
+    )
+
+    east, west = _get_env_endpoints("TEST_ENDPOINTS", key_header=("api-key", "{key}"))
+
+    assert (east.url, east.weight, east.deployment) == (
+        "https://east.example.com",
+        2.0,
+        "gpt-4o-east",
+    )
+    assert east.headers == {"api-key": "key-east"}
+    assert (west.weight, west.deployment, west.headers) == (1.0, None, {})
+    with pytest.raises(ValueError):
+        _get_env_endpoints("TEST_ENDPOINTS")
+
+
+def test_invalid_strategy():
+    with pytest.raises(ValueError):
+        make_balancer(strategy="random")
+
+
+def test_requests_are_rewritten_to_selected_endpoint():
+    hosts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append((request.url.host, request.url.path, request.headers["host"]))
+        return httpx.Response(200, json={})
+
+    balancer = make_balancer()
+    route = RequestRoute(hooks=[balancer])
+    client = CustomHTTPXClient(transport=httpx.MockTransport(handler))
+    route_id = client.register_route(route)
+    for i in range(3):
+        client.post(
+            "http://localhost:11434/v1/chat/completions",
+            json={},
+            headers={"x-trace-id": str(i), ROUTE_HEADER: route_id},
+        )
+
+    assert hosts == [
+        ("box-a", "/v1/chat/completions", "box-a:11434"),
+        ("box-b", "/v1/chat/completions", "box-b:11434"),
+        ("box-a", "/v1/chat/completions", "box-a:11434"),
+    ]
+
+
+def test_azure_deployment_is_rewritten_per_endpoint():
+    endpoints = [
+        EndpointSettings(
+            url="https://eastus.openai.azure.com",
+            deployment="gpt-4o-east",
+            headers={"api-key": "east-key"},
+        )
+    ]
+    balancer = EndpointBalancer(
+        "https://westus.openai.azure.com", endpoints, deployment="gpt-4o"
+    )
+    request = httpx.Request(
+        "POST",
+        "https://westus.openai.azure.com/openai/deployments/gpt-4o/chat/completions?api-version=1",
+    )
+    balancer.before_send(request)
+    assert str(request.url) == (
+        "https://eastus.openai.azure.com/openai/deployments/gpt-4o-east/chat/completions?api-version=1"
+    )
+    assert request.headers["api-key"] == "east-key"
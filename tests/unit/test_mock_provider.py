@@ -0,0 +1,113 @@
+import datetime
+import random
+from enum import Enum
+from typing import Dict, List, Literal, Optional
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+from pydantic import BaseModel, Field
+
+from ava_mosaic_ai.config.settings import LLMProvider, MockSettings, Settings
+from ava_mosaic_ai.llm_factory import LLMFactory
+from ava_mosaic_ai.mock_provider import MockLLMTransport, synthesize
+from tests.helpers import MESSAGES, User
+
+
+class Status(str, Enum):
+    ACTIVE = "active"
+    BLOCKED = "blocked"
+
+
+class Address(BaseModel):
+    street: str = Field(min_length=20, max_length=40)
+    zip_code: str = Field(max_length=5)
+
+
+class Account(BaseModel):
+    id: int = Field(gt=10, le=20)
+    balance: float = Field(ge=-5.0, lt=5.0)
+    status: Status
+    kind: Literal["personal", "business"]
+    opened: datetime.date
+    tags: List[str] = Field(min_length=2, max_length=4)
+    addresses: List[Address]
+    manager: Optional["Account"] = None
+    scores: Dict[str, int] = Field(default_factory=dict)
+
+
+def make_factory(**settings):
+    mock_settings = Mock(spec=Settings)
+    mock_settings.get_provider_settings.return_value = MockSettings(seed=7, **settings)
+    with patch("ava_mosaic_ai.llm_factory.get_settings", return_value=mock_settings):
+        return LLMFactory(LLMProvider.MOCK)
+
+
+def chat_request(timeout=None):
+    request = httpx.Request(
+        "POST", "http://mock.ava-mosaic.local/v1/chat/completions", json={"messages": []}
+    )
+    if timeout is not None:
+        request.extensions["timeout"] = {"read": timeout}
+    return request
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_synthesized_values_are_schema_valid(seed):
+    value = synthesize(Account.model_json_schema(), random.Random(seed))
+    Account.model_validate(value)
+
+
+def test_mock_provider_runs_the_full_audit_path():
+    llm = make_factory(latency=0.02)
+
+    user = llm.create_completion(User, MESSAGES)
+
+    assert isinstance(user.name, str) and isinstance(user.age, int)
+    audit_data = llm.get_audit_data(user)
+    assert audit_data["request_time"] >= 0.02
+    assert audit_data["http_request"]["url"].startswith("http://mock.ava-mosaic.local/v1")
+    usage = audit_data["http_response"]["content"]["usage"]
+    assert usage["prompt_tokens"] > 0 and usage["completion_tokens"] > 0
+
+
+def test_mock_provider_nested_models_and_candidates():
+    llm = make_factory(completion_tokens=50)
+
+    account = llm.create_completion(Account, MESSAGES, candidates=3)
+
+    assert isinstance(account, Account)
+    assert llm.get_audit_data(account)["candidates"]["valid"] == 3
+    assert llm.get_audit_data(account)["http_response"]["content"]["usage"]["completion_tokens"] == 50
+
+
+def test_failure_rates():
+    rate_limited = MockLLMTransport(MockSettings(rate_limit_rate=1.0, retry_after=2))
+    response = rate_limited.handle_request(chat_request())
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2.0"
+
+    failing = MockLLMTransport(MockSettings(error_rate=1.0))
+    assert failing.handle_request(chat_request()).status_code == 500
+
+
+def test_latency_distributions():
+    recorded = MockLLMTransport(
+        MockSettings(latency_distribution="recorded", latency_samples=[0.1, 0.2], seed=1)
+    )
+    assert {recorded.sample_latency() for _ in range(50)} == {0.1, 0.2}
+
+    lognormal = MockLLMTransport(
+        MockSettings(latency_distribution="lognormal", latency=0.1, latency_sigma=0.3, seed=1)
+    )
+    samples = sorted(lognormal.sample_latency() for _ in range(1001))
+    assert samples[500] == pytest.approx(0.1, rel=0.1)
+
+    with pytest.raises(ValueError):
+        MockLLMTransport(MockSettings(latency_distribution="recorded"))
+
+
+def test_latency_above_read_timeout_times_out():
+    slow = MockLLMTransport(MockSettings(latency=10.0))
+    with pytest.raises(httpx.ReadTimeout):
+        slow.handle_request(chat_request(timeout=0.01))
@@ -0,0 +1,143 @@
+import json
+import re
+import threading
+import time
+
+import httpx
+import pytest
+
+from ava_mosaic_ai.config.settings import OpenAISettings
+from ava_mosaic_ai.token_budget import FRAMING_TOKENS, TokenBudgetEstimator
+from tests.helpers import User, chat_completion
+
+INSTRUCTIONS = "Extract the user."
+INPUT = re.compile(r'<input index="(\d+)">\n(.*?)\n</input>', re.S)
+
+
+def parse_user(text):
+    name, age = text.split(",")
+    # "bad" inputs get an age that does not validate
+    return {"name": name.strip(), "age": "unknown" if age.strip() == "bad" else int(age)}
+
+
+@pytest.fixture
+def make_packing_factory(make_factory):
+    def make(status=200, provider_settings=None):
+        requests = []
+        lock = threading.Lock()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            content = body["messages"][-1]["content"]
+            inputs = INPUT.findall(content)
+            with lock:
+                requests.append((request.headers["x-trace-id"], len(inputs) or 1, body))
+            if status != 200:
+                return httpx.Response(status, json={"error": {"message": "rejected"}})
+            if inputs:
+                tasks = [dict(parse_user(text), index=int(index)) for index, text in inputs]
+                arguments = json.dumps({"tasks": tasks})
+            else:
+                user = parse_user(content)
+                if user["age"] == "unknown":
+                    user["age"] = 0
+                arguments = json.dumps(user)
+            return httpx.Response(200, json=chat_completion(arguments))
+
+        factory, _ = make_factory(handler, provider_settings=provider_settings)
+        return factory, requests
+
+    return make
+
+
+def test_packed_results_map_back_to_each_caller(make_packing_factory):
+    factory, requests = make_packing_factory()
+
+    packer = factory.create_packer(
+        User, INSTRUCTIONS, max_batch_size=4, max_wait=1.0, max_tokens=50
+    )
+    with packer:
+        futures = [
+            packer.submit(f"User {i}, {20 + i}", trace_id=f"trace-{i}") for i in range(4)
+        ]
+        users = [future.result(timeout=5) for future in futures]
+
+    assert len(requests) == 1
+    assert [(user.name, user.age) for user in users] == [(f"User {i}", 20 + i) for i in range(4)]
+    assert all(type(user) is User for user in users)
+    for i, user in enumerate(users):
+        audit_data = factory.get_audit_data(user)
+        assert audit_data["trace_id"] == f"trace-{i}"
+        assert audit_data["batch"] == {"trace_id": requests[0][0], "index": i, "size": 4}
+    # one max_tokens budget per packed item
+    assert requests[0][2]["max_tokens"] == FRAMING_TOKENS + 4 * 50
+    assert packer.stats()["mean_batch_size"] == 4
+
+
+def test_packed_max_tokens_stays_within_the_provider_limit(make_packing_factory):
+    # Anthropic style settings, max_tokens is a per request limit
+    settings = OpenAISettings(api_key="test_key", max_tokens=1024)
+    factory, requests = make_packing_factory(provider_settings=settings)
+
+    with factory.create_packer(User, INSTRUCTIONS, max_batch_size=16, max_wait=1.0) as packer:
+        users = packer.map([f"User {i}, {i}" for i in range(16)])
+        assert [user.age for user in users] == list(range(16))
+        assert requests[0][2]["max_tokens"] == 1024
+
+        factory.settings.auto_max_tokens = True
+        factory.token_budget = TokenBudgetEstimator(min_observations=1)
+        factory.create_completion(User, [{"role": "user", "content": "Ann, 31"}])
+        packer.map([f"User {i}, {i}" for i in range(16)])
+
+    # 16 observed budgets of 64 tokens are capped at the limit
+    assert factory.token_budget.budget("gpt-4o", User) == 64
+    assert [size for _, size, _ in requests] == [16, 1, 16]
+    assert requests[2][2]["max_tokens"] == 1024
+
+
+def test_invalid_items_are_split_and_rerun(make_packing_factory):
+    factory, requests = make_packing_factory()
+
+    with factory.create_packer(User, INSTRUCTIONS, max_batch_size=4, max_wait=1.0) as packer:
+        futures = [
+            packer.submit(text)
+            for text in ["Ann, 31", "Bob, bad", "Cid, 33", "Dee, 34"]
+        ]
+        users = [future.result(timeout=5) for future in futures]
+
+    assert [user.name for user in users] == ["Ann", "Bob", "Cid", "Dee"]
+    # the valid items of the failed batch are kept, only "Bob" is re-run on its own
+    assert [size for _, size, _ in requests] == [4, 1]
+    assert factory.get_audit_data(users[0])["error"].startswith("InstructorRetryException")
+    assert factory.get_audit_data(users[1])["trace_id"] == requests[1][0]
+    stats = packer.stats()
+    assert stats["splits"] == 1 and stats["single"] == 1
+
+
+def test_request_errors_fail_the_whole_batch_without_splitting(make_packing_factory):
+    factory, requests = make_packing_factory(status=400)
+
+    with factory.create_packer(User, INSTRUCTIONS, max_batch_size=4, max_wait=1.0) as packer:
+        futures = [packer.submit(f"User {i}, {i}") for i in range(4)]
+        errors = [future.exception(timeout=5) for future in futures]
+
+    assert len(requests) == 1
+    assert all(error is errors[0] for error in errors)
+    assert "rejected" in str(errors[0])
+    assert packer.stats()["splits"] == 0
+
+
+def test_batches_flush_on_size_and_on_wait(make_packing_factory):
+    factory, requests = make_packing_factory()
+
+    with factory.create_packer(User, INSTRUCTIONS, max_batch_size=3, max_wait=0.05) as packer:
+        users = packer.map([f"User {i}, {i}" for i in range(5)])
+        started = time.monotonic()
+        user = packer("Late, 40")
+        waited = time.monotonic() - started
+
+    assert [user.age for user in users] == list(range(5))
+    assert [size for _, size, _ in requests] == [3, 2, 1]
+    assert user.name == "Late" and 0.05 <= waited < 1.0
+    with pytest.raises(RuntimeError):
+        packer.submit("Closed, 1")
@@ -0,0 +1,50 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tests.helpers import User
+
+MESSAGES = [
+    {"role": "system", "content": "Extract the user, answer in JSON like {{\"name\": ...}}."},
+    {"role": "user", "content": "{text}"},
+]
+
+
+def test_prepared_completion_fills_variables(make_factory):
+    factory, seen = make_factory(['{"name": "John", "age": 30}'])
+    extract = factory.prepare_completion(User, MESSAGES, temperature=0.0)
+
+    user = extract(text="John Doe is 30 years old.")
+
+    assert (user.name, user.age) == ("John", 30)
+    body = json.loads(seen[0].content)
+    assert body["temperature"] == 0.0
+    assert body["messages"][0]["content"] == 'Extract the user, answer in JSON like {"name": ...}.'
+    assert body["messages"][1]["content"] == "John Doe is 30 years old."
+    assert factory.get_audit_data(user)["trace_id"] == seen[0].headers["x-trace-id"]
+
+
+def test_prepared_completion_validates_variables(make_factory):
+    factory, _ = make_factory([])
+    extract = factory.prepare_completion(User, MESSAGES)
+    assert extract.variables == {"text"}
+    with pytest.raises(ValueError):
+        extract()
+    with pytest.raises(ValueError):
+        factory.prepare_completion(User, [{"role": "user", "content": "{timeout}"}])
+
+
+def test_prepared_completion_is_thread_safe(make_factory):
+    texts = [f"User {i} is {i} years old." for i in range(20)]
+    factory, seen = make_factory(
+        [json.dumps({"name": f"User {i}", "age": i}) for i in range(20)]
+    )
+    extract = factory.prepare_completion(User, MESSAGES)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        users = list(pool.map(lambda text: extract(text=text), texts))
+
+    assert len({factory.get_trace_id(user) for user in users}) == 20
+    sent = sorted(json.loads(request.content)["messages"][1]["content"] for request in seen)
+    assert sent == sorted(texts)
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from ava_mosaic_ai.deadline import DeadlineExceededError
+from ava_mosaic_ai.scheduler import PriorityClass, RequestScheduler, SchedulerOverloadedError
+from tests.helpers import MESSAGES, User
+
+
+def run_in_order(scheduler, priorities):
+    """Queue one request per priority behind a held slot, return the admission order."""
+    order = []
+    blocker = scheduler.acquire("batch")
+    threads = []
+    for i, priority in enumerate(priorities):
+        def work(priority=priority, i=i):
+            ticket = scheduler.acquire(priority)
+            order.append(priority)
+            scheduler.release(ticket)
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        threads.append(thread)
+        # make sure requests are queued in the listed order
+        while sum(s["queued"] for s in scheduler.stats().values()) < i + 1:
+            time.sleep(0.001)
+    scheduler.release(blocker)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_weighted_fair_queuing_favours_heavier_class():
+    scheduler = RequestScheduler(
+        max_concurrency=1,
+        classes={"interactive": PriorityClass(weight=3), "batch": PriorityClass(weight=1)},
+    )
+    order = run_in_order(scheduler, ["batch"] * 4 + ["interactive"] * 4)
+    assert order[:4].count("interactive") == 3
+
+
+def test_class_concurrency_cap():
+    scheduler = RequestScheduler(
+        max_concurrency=4,
+        classes={"batch": PriorityClass(max_concurrency=1, max_queue_wait=0.05)},
+    )
+    first = scheduler.acquire("batch")
+    with pytest.raises(SchedulerOverloadedError):
+        scheduler.acquire("batch")
+    other = scheduler.acquire("default")
+    scheduler.release(first)
+    scheduler.release(other)
+
+
+def test_queue_length_admission_control():
+    scheduler = RequestScheduler(
+        max_concurrency=1, classes={"batch": PriorityClass(max_queue_length=0)}
+    )
+    ticket = scheduler.acquire("batch")
+    with pytest.raises(SchedulerOverloadedError):
+        scheduler.acquire("batch")
+    scheduler.release(ticket)
+    assert scheduler.stats()["batch"]["shed"] == 1
+
+
+def test_deadline_while_queued():
+    scheduler = RequestScheduler(max_concurrency=1)
+    ticket = scheduler.acquire()
+    with pytest.raises(DeadlineExceededError):
+        scheduler.acquire(deadline=time.monotonic() + 0.05)
+    scheduler.release(ticket)
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError):
+        RequestScheduler(max_concurrency=1).acquire("urgent")
+
+
+def test_queue_time_is_reported_in_audit_data(make_factory):
+    scheduler = RequestScheduler(
+        max_concurrency=1, classes={"interactive": PriorityClass(weight=4)}
+    )
+    factory, _ = make_factory(['{"name": "John", "age": 30}'], scheduler=scheduler)
+
+    blocker = scheduler.acquire()
+    threading.Timer(0.1, scheduler.release, args=(blocker,)).start()
+    user = factory.create_completion(User, MESSAGES, priority="interactive")
+
+    audit_data = factory.get_audit_data(user)
+    assert audit_data["priority"] == "interactive"
+    assert audit_data["queue_time"] >= 0.09
+    assert audit_data["request_time"] < audit_data["queue_time"]
@@ -0,0 +1,117 @@
+import json
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from ava_mosaic_ai.token_budget import TokenBudgetEstimator, estimate_schema_tokens
+from tests.helpers import MESSAGES, User
+
+
+class Color(str, Enum):
+    RED = "red"
+    GREEN = "green"
+
+
+class Tag(BaseModel):
+    label: str = Field(max_length=12)
+    color: Color
+
+
+class Article(BaseModel):
+    title: str = Field(max_length=120)
+    summary: str = Field(max_length=600)
+    tags: List[Tag] = Field(max_length=5)
+    score: Optional[float] = None
+
+
+class Summary(BaseModel):
+    summary: str
+
+
+class FakeCompletion:
+    """Minimal stand-in for a raw OpenAI completion."""
+
+    def __init__(self, tokens: int, finish_reason: str = "stop"):
+        self.usage = type("Usage", (), {"completion_tokens": tokens})()
+        self.choices = [type("Choice", (), {"finish_reason": finish_reason})()]
+
+
+def test_schema_estimate_follows_constraints():
+    small = estimate_schema_tokens(User)
+    large = estimate_schema_tokens(Article)
+    assert 16 < small < large
+    # the summary bound alone is 200 tokens at 3 characters per token
+    assert large > 16 + 200 + 40
+
+
+def test_budget_tightens_with_observed_usage():
+    estimator = TokenBudgetEstimator(min_observations=3, min_tokens=1, max_tokens=4096)
+    initial = estimator.budget("gpt-4o", Article, default=0)
+    assert initial == round(estimator.schema_estimate(Article) * 1.5)
+
+    for tokens in (80, 95, 90):
+        estimator.observe("gpt-4o", Article, FakeCompletion(tokens))
+
+    assert estimator.budget("gpt-4o", Article) == 119  # 95 * 1.25
+    # other models keep their own observations
+    assert estimator.budget("gpt-4o-mini", Article, default=0) == initial
+
+
+def test_truncation_raises_the_floor():
+    estimator = TokenBudgetEstimator(min_observations=1, min_tokens=1)
+    estimator.observe("gpt-4o", User, FakeCompletion(20))
+    estimator.observe("gpt-4o", User, FakeCompletion(25, "length"), max_tokens=25)
+
+    assert estimator.budget("gpt-4o", User) == 50
+    assert estimator.stats()["gpt-4o/User"]["truncated"] == 1
+
+
+def test_budget_is_not_capped_below_observed_usage():
+    estimator = TokenBudgetEstimator(min_observations=20)
+    for _ in range(20):
+        estimator.observe("gpt-4o", Summary, FakeCompletion(6000))
+
+    # no provider limit, the budget follows what was observed
+    assert estimator.budget("gpt-4o", Summary) == 7500
+    # a configured limit caps the headroom, but not below the largest output seen
+    assert estimator.budget("gpt-4o", Summary, default=4096) == 6000
+
+    estimator.observe("gpt-4o", Summary, FakeCompletion(7500, "length"), max_tokens=7500)
+    assert estimator.budget("gpt-4o", Summary) == 15000
+    assert estimator.budget("gpt-4o", Summary, default=4096) == 15000
+
+
+def test_free_text_fields_are_not_capped_before_usage_is_observed():
+    estimator = TokenBudgetEstimator()
+
+    # unbounded strings are estimated at a few dozen tokens, far below real answers
+    assert estimator.schema_estimate(Summary) < 100
+    assert estimator.budget("gpt-4o", Summary) is None
+    assert estimator.budget("claude-3-5-sonnet", Summary, default=1024) == 1024
+
+    for _ in range(estimator.min_observations - 1):
+        estimator.observe("gpt-4o", Summary, FakeCompletion(700))
+    assert estimator.budget("gpt-4o", Summary) is None
+    estimator.observe("gpt-4o", Summary, FakeCompletion(700))
+    assert estimator.budget("gpt-4o", Summary) == 875
+
+
+def test_create_completion_sets_max_tokens(make_factory):
+    factory, seen = make_factory(['{"name": "John", "age": 30}'] * 3)
+    factory.settings.auto_max_tokens = True
+    factory.token_budget = TokenBudgetEstimator(min_observations=1)
+
+    first = factory.create_completion(User, MESSAGES)
+    second = factory.create_completion(User, MESSAGES)
+    factory.create_completion(User, MESSAGES, max_tokens=10)
+
+    # OpenAI's default is no limit, kept until usage was observed
+    assert json.loads(seen[0].content).get("max_tokens") is None
+    assert factory.get_audit_data(first)["max_tokens"] is None
+    # 5 observed output tokens * 1.25 is below min_tokens
+    assert factory.token_budget.budget("gpt-4o", User) == 64
+    assert json.loads(seen[1].content)["max_tokens"] == 64
+    assert factory.get_audit_data(second)["max_tokens"] == 64
+    assert json.loads(seen[2].content)["max_tokens"] == 10
+    assert factory.token_budget.stats()["gpt-4o/User"]["max_output_tokens"] == 5
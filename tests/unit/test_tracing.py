@@ -0,0 +1,97 @@
+import pytest
+
+from ava_mosaic_ai.tracing import (
+    InMemoryTracer,
+    SpanContext,
+    Tracer,
+    format_traceparent,
+    parse_traceparent,
+)
+from tests.helpers import MESSAGES, User
+
+
+def test_traceparent_round_trip():
+    context = SpanContext("a" * 32, "b" * 16, True)
+    assert parse_traceparent(format_traceparent(context)) == context
+    assert parse_traceparent("garbage") is None
+
+
+def test_sampling_is_deterministic_per_trace_id():
+    tracer = Tracer(sample_rate=0.5)
+    assert tracer.should_sample("0" * 32) is True
+    assert tracer.should_sample("f" * 32) is False
+
+
+def test_completion_spans_and_incoming_context(make_factory):
+    tracer = InMemoryTracer()
+    factory, seen = make_factory(
+        ['{"name": "John"}', '{"name": "John Doe", "age": 30}'], tracer=tracer
+    )
+    incoming = "00-" + "1" * 32 + "-" + "2" * 16 + "-01"
+
+    user = factory.create_completion(
+        response_model=User, messages=MESSAGES, max_retries=2, trace_context=incoming
+    )
+
+    assert user.age == 30
+    spans = {span.name: [] for span in tracer.exporter.spans}
+    for span in tracer.exporter.spans:
+        spans[span.name].append(span)
+    (completion,) = spans["llm.completion"]
+    assert completion.context.trace_id == "1" * 32
+    assert completion.parent_id == "2" * 16
+    assert len(spans["llm.http"]) == 2
+    assert {s.parent_id for s in spans["llm.http"]} == {completion.context.span_id}
+    # the provider sees the http attempt span as the parent
+    assert [parse_traceparent(r.headers["traceparent"]).span_id for r in seen] == [
+        s.context.span_id for s in spans["llm.http"]
+    ]
+    # validation spans rely on instructor hooks, missing on old instructor versions
+    if "llm.validation" in spans:
+        assert [s.status for s in spans["llm.validation"]] == ["error", "ok"]
+
+
+def test_unsampled_requests_skip_body_capture(make_factory):
+    tracer = InMemoryTracer(sample_rate=0.0)
+    factory, _ = make_factory(['{"name": "John Doe", "age": 30}'], tracer=tracer)
+
+    user = factory.create_completion(response_model=User, messages=MESSAGES)
+
+    audit_data = factory.get_audit_data(user)
+    assert "content" not in audit_data["http_request"]
+    assert audit_data["http_response"] == {"status_code": 200}
+    assert tracer.exporter.spans == []
+
+
+def test_sampled_requests_capture_bodies(make_factory):
+    factory, _ = make_factory(['{"name": "John Doe", "age": 30}'], tracer=InMemoryTracer())
+
+    user = factory.create_completion(response_model=User, messages=MESSAGES)
+
+    audit_data = factory.get_audit_data(user)
+    assert audit_data["http_request"]["content"]["messages"] == MESSAGES
+    assert audit_data["http_response"]["content"]["usage"]["total_tokens"] == 15
+
+
+def test_opentelemetry_tracer_uses_otel_ids(make_factory):
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+
+    from ava_mosaic_ai.tracing import OpenTelemetryTracer
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    factory, _ = make_factory(
+        ['{"name": "John Doe", "age": 30}'],
+        tracer=OpenTelemetryTracer(provider.get_tracer("test")),
+    )
+
+    factory.create_completion(response_model=User, messages=MESSAGES)
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert spans["llm.http"].parent.span_id == spans["llm.completion"].context.span_id
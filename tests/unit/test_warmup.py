@@ -0,0 +1,88 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+
+from ava_mosaic_ai.config.settings import LlamaSettings, LLMProvider, Settings
+from ava_mosaic_ai.llm_factory import CustomHTTPXClient, LLMFactory
+
+
+@pytest.fixture
+def server():
+    client_ports = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_HEAD(self):
+            client_ports.add(self.client_address[1])
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/v1", client_ports
+    httpd.shutdown()
+
+
+def test_warm_up_opens_distinct_connections(server):
+    url, client_ports = server
+    client = CustomHTTPXClient()
+
+    assert client.warm_up([url], connections=4) == {url: 4}
+    assert len(client_ports) == 4
+
+    # a second round reuses the pooled connections
+    client.warm_up([url], connections=4)
+    assert len(client_ports) == 4
+
+
+def test_warm_up_reports_unreachable_endpoints():
+    client = CustomHTTPXClient()
+    url = "http://127.0.0.1:9/v1"
+    assert client.warm_up([url], connections=2, timeout=1.0) == {url: 0}
+
+
+def test_factory_is_ready_after_startup_warm_up(server):
+    url, client_ports = server
+    settings = Mock(spec=Settings)
+    settings.get_provider_settings.return_value = LlamaSettings(
+        base_url=url, warmup_connections=3
+    )
+    with patch("ava_mosaic_ai.llm_factory.get_settings", return_value=settings):
+        factory = LLMFactory(LLMProvider.LLAMA)
+
+    assert factory.wait_until_ready(timeout=5)
+    assert factory.warmup_report == {f"{url}/": 3}
+    assert len(client_ports) == 3
+    factory.close()
+
+
+def test_failed_warm_up_still_marks_the_factory_ready(server):
+    url, _ = server
+
+    class BrokenClient(CustomHTTPXClient):
+        def warm_up(self, urls, connections=1, timeout=5.0):
+            raise OSError("no route to host")
+
+    settings = Mock(spec=Settings)
+    settings.get_provider_settings.return_value = LlamaSettings(
+        base_url=url, warmup_connections=2
+    )
+    with patch("ava_mosaic_ai.llm_factory.get_settings", return_value=settings):
+        broken = LLMFactory(LLMProvider.LLAMA, http_client=BrokenClient())
+        plain = LLMFactory(LLMProvider.LLAMA, http_client=httpx.Client())
+
+    assert broken.wait_until_ready(timeout=2)
+    assert broken.warmup_report == {f"{url}/": 0}
+    # clients without warm_up are not warmed up at all
+    assert plain.wait_until_ready(timeout=0)
+    assert plain.warm_up() == {}
+    broken.close()